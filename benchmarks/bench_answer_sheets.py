@@ -0,0 +1,99 @@
+"""
+Packed answer sheets vs. one row per answer.
+
+Stores the same random attempts in two SQLite databases, once with the
+former row-per-answer layout (an indexed attempt/question/option table)
+and once as packed sheets, then compares file sizes after VACUUM and
+the time to scan and score every attempt.
+
+    python benchmarks/bench_answer_sheets.py [--attempts 20000] [--questions 50]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from array import array
+
+from common import setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=20000)
+    parser.add_argument('--questions', type=int, default=50)
+    args = parser.parse_args()
+
+    setup(database=False)
+    from quiz import sheets
+
+    question_ids = list(range(1, args.questions + 1))
+    answer_key = {question_id: question_id * 10 + 1 for question_id in question_ids}
+    key = sheets.key_vector(question_ids, answer_key)
+
+    random.seed(1)
+    selections = [
+        [question_id * 10 + random.randint(1, 4) for question_id in question_ids]
+        for _ in range(args.attempts)
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        rows = sqlite3.connect(os.path.join(directory, 'rows.sqlite3'))
+        rows.execute('CREATE TABLE attempt (id INTEGER PRIMARY KEY, score INTEGER)')
+        rows.execute(
+            'CREATE TABLE answer (id INTEGER PRIMARY KEY, attempt_id INTEGER, '
+            'question_id BIGINT, option_id BIGINT)'
+        )
+        rows.execute('CREATE INDEX answer_attempt ON answer (attempt_id)')
+        rows.executemany('INSERT INTO attempt VALUES (?, 0)', [(i,) for i in range(1, args.attempts + 1)])
+        rows.executemany(
+            'INSERT INTO answer (attempt_id, question_id, option_id) VALUES (?, ?, ?)',
+            (
+                (attempt_id, question_id, option_id)
+                for attempt_id, options in enumerate(selections, 1)
+                for question_id, option_id in zip(question_ids, options)
+            )
+        )
+
+        packed = sqlite3.connect(os.path.join(directory, 'packed.sqlite3'))
+        packed.execute('CREATE TABLE attempt (id INTEGER PRIMARY KEY, score INTEGER, answer_sheet BLOB)')
+        packed.executemany(
+            'INSERT INTO attempt VALUES (?, 0, ?)',
+            ((attempt_id, array(sheets.TYPECODE, options).tobytes()) for attempt_id, options in enumerate(selections, 1))
+        )
+
+        for connection in (rows, packed):
+            connection.commit()
+            connection.execute('VACUUM')
+
+        print(f'{args.attempts} attempts x {args.questions} questions:')
+        for name in ('rows', 'packed'):
+            size = os.path.getsize(os.path.join(directory, f'{name}.sqlite3'))
+            print(f'  {name:<7} {size / 1e6:6.1f} MB')
+
+        started = time.perf_counter()
+        row_scores = {}
+        for attempt_id, question_id, option_id in rows.execute(
+            'SELECT attempt_id, question_id, option_id FROM answer ORDER BY attempt_id'
+        ):
+            if answer_key.get(question_id) == option_id:
+                row_scores[attempt_id] = row_scores.get(attempt_id, 0) + 1
+        row_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        packed_scores = {
+            attempt_id: sheets.score(sheet, key)
+            for attempt_id, sheet in packed.execute('SELECT id, answer_sheet FROM attempt ORDER BY id')
+        }
+        packed_seconds = time.perf_counter() - started
+
+        assert all(row_scores.get(attempt_id, 0) == score for attempt_id, score in packed_scores.items())
+        print(f'  scan and score: rows {row_seconds:.2f}s, packed {packed_seconds:.2f}s')
+
+        rows.close()
+        packed.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Set-based quiz cloning and deletion vs. the per-row ORM equivalents.
+
+Clones a large quiz with one `create()` per question and option and with
+`bulk.clone_quiz()`, then deletes one copy through Django's cascade
+collector and the other with `bulk.delete_quiz()`, reporting the time
+and number of queries of each. With --memory the peak Python allocation
+is reported too (tracing slows everything down, so times are not
+comparable with a run without it).
+
+    python benchmarks/bench_clone_delete.py [--questions 10000] [--options 4] [--memory]
+"""
+import argparse
+import tracemalloc
+
+from common import Measure, make_quiz, setup
+
+
+def measure(label, func, memory):
+    if memory:
+        tracemalloc.start()
+    with Measure(label):
+        func()
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'  {"":<28} peak {peak / 1e6:.1f} MB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--questions', type=int, default=10000)
+    parser.add_argument('--options', type=int, default=4)
+    parser.add_argument('--memory', action='store_true')
+    args = parser.parse_args()
+
+    setup()
+    from django.db import transaction
+    from quiz import bulk
+    from quiz.models import Option, Question, Quiz
+
+    source = make_quiz('Source', questions=args.questions, options=args.options)
+
+    def clone_per_row():
+        with transaction.atomic():
+            clone = Quiz.objects.create(title='Per-row copy')
+            for question in source.questions.prefetch_related('options'):
+                copy = Question.objects.create(quiz=clone, text=question.text)
+                for option in question.options.all():
+                    Option.objects.create(question=copy, text=option.text, is_correct=option.is_correct)
+
+    print(f'{args.questions} questions x {args.options} options:')
+    measure('clone per row', clone_per_row, args.memory)
+    measure('clone bulk', lambda: bulk.clone_quiz(source, 'Bulk copy'), args.memory)
+
+    per_row = Quiz.objects.get(title='Per-row copy')
+    bulk_copy = Quiz.objects.get(title='Bulk copy')
+    measure('delete cascade collector', per_row.delete, args.memory)
+    measure('delete set-based', lambda: bulk.delete_quiz(bulk_copy.pk), args.memory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Vectorized item analysis vs. Python loops over the ORM rows.
+
+Stores `--attempts` simulated attempts (answers correlated with a random
+skill level, with some questions left unanswered) of a `--questions`
+question quiz, then times `analytics.analyze()` against a straightforward
+pure-Python computation of item difficulty and discrimination, checking
+that both agree.
+
+    python benchmarks/bench_item_analysis.py [--attempts 100000] [--questions 200]
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from common import make_quiz, setup
+
+
+def python_loops(quiz, snapshot):
+    from quiz import sheets
+    from quiz.models import Attempt
+
+    key = sheets.key_vector(snapshot.question_ids, snapshot.answer_key)
+    count = len(key)
+    correct = [0] * count
+    option_counts = {}
+    totals = []
+    items = []
+    for attempt in Attempt.objects.filter(quiz=quiz).only('answer_sheet').iterator(chunk_size=5000):
+        row = list(sheets.decode(attempt.answer_sheet))
+        scored = [1 if row[index] == key[index] else 0 for index in range(count)]
+        for index in range(count):
+            correct[index] += scored[index]
+            option_counts[(index, row[index])] = option_counts.get((index, row[index]), 0) + 1
+        totals.append(sum(scored))
+        items.append(scored)
+
+    attempts = len(totals)
+    difficulty = [value / attempts for value in correct]
+    discrimination = []
+    for index in range(count):
+        column = [scored[index] for scored in items]
+        rest = [total - value for total, value in zip(totals, column)]
+        discrimination.append(statistics.correlation(column, rest))
+    return difficulty, discrimination
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=100000)
+    parser.add_argument('--questions', type=int, default=200)
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+    from quiz import analytics, snapshots
+    from quiz.models import Attempt
+
+    quiz = make_quiz(questions=args.questions)
+    snapshot = snapshots.get_snapshot(quiz)
+    option_ids = np.array(
+        [[option['id'] for option in question['options']] for question in snapshot.take['data']],
+        dtype='<u8'
+    )
+
+    # Option 1 is correct; stronger candidates pick it more often
+    rng = np.random.default_rng(1)
+    shape = (args.attempts, args.questions)
+    right = rng.random(shape) < rng.random(args.attempts)[:, None]
+    choice = np.where(right, 1, rng.integers(0, option_ids.shape[1], shape))
+    answer_sheets = option_ids[np.arange(args.questions), choice]
+    answer_sheets[rng.random(shape) < 0.03] = 0
+    scores = (answer_sheets == option_ids[:, 1]).sum(axis=1)
+
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {Attempt._meta.db_table} '
+            '(quiz_id, version, score, total, graded_version, answer_sheet, created_at) '
+            'VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)',
+            [
+                (quiz.pk, quiz.version, int(scores[row]), args.questions, quiz.version, answer_sheets[row].tobytes())
+                for row in range(args.attempts)
+            ]
+        )
+
+    print(f'{args.attempts} attempts x {args.questions} questions:')
+    started = time.perf_counter()
+    report = analytics.analyze(quiz)
+    vectorized = time.perf_counter() - started
+    print(f'  vectorized     {vectorized:7.2f}s')
+
+    started = time.perf_counter()
+    difficulty, discrimination = python_loops(quiz, snapshot)
+    loops = time.perf_counter() - started
+    print(f'  python loops   {loops:7.2f}s')
+
+    for item, expected_difficulty, expected_discrimination in zip(report['items'], difficulty, discrimination):
+        assert abs(item['difficulty'] - expected_difficulty) < 1e-3
+        assert abs(item['discrimination'] - expected_discrimination) < 1e-3
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Login latency under a burst: bounded hashing pool vs. unbounded hashing.
+
+Fires `--logins` concurrent logins from `--threads` client threads at the
+login endpoint, whose password checks run on the bounded hashing pool,
+and reports the latency of admitted and shed (503) requests. Then runs
+the same burst through plain `authenticate()`, which hashes on every
+request thread at once.
+
+    python benchmarks/bench_login_pool.py [--logins 64] [--threads 32]
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import setup
+
+
+USERNAME = 'admin'
+PASSWORD = 'securepass123'
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def burst(func, logins, threads):
+    from django.db import connections
+
+    def timed(_):
+        """(seconds, result) of one call"""
+        started = time.perf_counter()
+        try:
+            result = func()
+            return time.perf_counter() - started, result
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(timed, range(logins)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=32)
+    args = parser.parse_args()
+
+    setup()
+    # Every shed login would otherwise log a "Service Unavailable" error
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    from django.contrib.auth import authenticate
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+
+    User.objects.create_user(USERNAME, 'admin@example.com', PASSWORD, is_staff=True)
+
+    def login():
+        return APIClient().post(
+            '/api/auth/login/', {'username': USERNAME, 'password': PASSWORD}, format='json'
+        ).status_code
+
+    results = burst(login, args.logins, args.threads)
+    admitted = [seconds for seconds, status in results if status == 200]
+    shed = [seconds for seconds, status in results if status == 503]
+    print(f'{args.logins} logins from {args.threads} threads:')
+    print(
+        f'  bounded pool   admitted {len(admitted):3d}  p50 {percentile(admitted, .5):6.3f}s  '
+        f'p99 {percentile(admitted, .99):6.3f}s'
+    )
+    print(f'                 shed     {len(shed):3d}  p99 {percentile(shed, .99):6.3f}s')
+
+    results = burst(lambda: authenticate(username=USERNAME, password=PASSWORD), args.logins, args.threads)
+    unbounded = [seconds for seconds, _ in results]
+    print(
+        f'  unbounded      all      {len(unbounded):3d}  p50 {percentile(unbounded, .5):6.3f}s  '
+        f'p99 {percentile(unbounded, .99):6.3f}s'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Pre-compressed payload variants vs. compressing every response.
+
+Renders the take payload of a 200-question quiz, then compares the size
+of its identity and gzip variants and the per-request cost of gzipping
+on the fly against a cache hit plus Accept-Encoding negotiation.
+
+    python benchmarks/bench_payload_compression.py [--questions 200]
+"""
+import argparse
+import gzip
+
+from common import best_of, make_quiz, setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--questions', type=int, default=200)
+    args = parser.parse_args()
+
+    setup()
+    from django.core.cache import cache
+    from quiz import cache as payload_cache
+    from quiz import snapshots
+
+    quiz = make_quiz(questions=args.questions)
+    variants = payload_cache.build_variants(snapshots.get_snapshot(quiz).take)
+    body = variants[payload_cache.IDENTITY]
+
+    print(f'{args.questions}-question take payload:')
+    for encoding in (payload_cache.IDENTITY, payload_cache.GZIP, payload_cache.BROTLI):
+        if encoding in variants:
+            print(f'  {encoding:<9} {len(variants[encoding]):7d} bytes')
+
+    key = payload_cache.payload_key(payload_cache.TAKE, quiz.pk, quiz.version)
+    cache.set(key, variants)
+    on_the_fly = best_of(lambda: gzip.compress(body, compresslevel=6), number=500)
+    cached = best_of(
+        lambda: payload_cache.negotiate_encoding('gzip, deflate, br', cache.get(key)), number=500
+    )
+    print(f'  gzip per request       {on_the_fly * 1e6:7.0f}us')
+    print(f'  cached variant lookup  {cached * 1e6:7.0f}us')
+
+
+if __name__ == '__main__':
+    main()
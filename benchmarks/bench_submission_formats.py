@@ -0,0 +1,75 @@
+"""
+Cost of validating and scoring a submission, `answers` list vs. compact
+`selections`.
+
+Parses the same answers to a `--questions` question exam in both submit
+formats, from the JSON body to a scored, packed answer sheet, as the
+submit view does. No database is involved: the snapshot is built in
+memory.
+
+    python benchmarks/bench_submission_formats.py [--questions 200]
+"""
+import argparse
+import json
+import random
+
+from common import best_of, setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--questions', type=int, default=200)
+    args = parser.parse_args()
+
+    setup(database=False)
+    from quiz import sheets
+    from quiz.serializers import AnswerSubmissionSerializer
+    from quiz.snapshots import Snapshot
+
+    question_ids = range(1, args.questions + 1)
+    take = {
+        'data': [
+            {
+                'id': question_id,
+                'text': 'Question',
+                'options': [{'id': question_id * 10 + position, 'text': 'Option'} for position in range(4)],
+            }
+            for question_id in question_ids
+        ]
+    }
+    snapshot = Snapshot(1, 1, take, {question_id: question_id * 10 + 1 for question_id in question_ids})
+
+    random.seed(0)
+    selections = [question_id * 10 + random.randrange(4) for question_id in question_ids]
+    answers_body = json.dumps({
+        'version': 1,
+        'answers': [
+            {'question_id': question_id, 'option_id': option_id}
+            for question_id, option_id in zip(snapshot.question_ids, selections)
+        ],
+    })
+    selections_body = json.dumps({'version': 1, 'selections': selections})
+
+    def answers_format():
+        serializer = AnswerSubmissionSerializer(data=json.loads(answers_body))
+        serializer.is_valid(raise_exception=True)
+        sheet = sheets.encode(snapshot, serializer.validated_data['answers'])
+        return sheets.score(sheet, snapshot.key), bytes(sheet)
+
+    def selections_format():
+        sheet = sheets.pack_selections(snapshot, json.loads(selections_body)['selections'])
+        return sheets.score(sheet, snapshot.key), bytes(sheet)
+
+    assert answers_format() == selections_format()
+
+    print(f'{args.questions}-question submission:')
+    for name, func, body in (
+        ('answers', answers_format, answers_body),
+        ('selections', selections_format, selections_body),
+    ):
+        seconds = best_of(func, number=2000)
+        print(f'  {name:<11} {seconds * 1e6:8.1f}us  body {len(body)} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Shared setup for the benchmark scripts.
+
+Every script runs standalone from the repository root, e.g.
+`python benchmarks/bench_payload_compression.py`, against a freshly
+migrated SQLite database in a temporary directory, so db.sqlite3 is never
+touched. Figures quoted in the readme were produced by these scripts.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup(database=True):
+    """Configure Django; with `database`, on a throwaway migrated SQLite file"""
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quiz_project.settings')
+
+    from django.conf import settings
+
+    if database:
+        directory = tempfile.mkdtemp(prefix='quiz-bench-')
+        atexit.register(shutil.rmtree, directory, ignore_errors=True)
+        settings.DATABASES['default']['NAME'] = os.path.join(directory, 'bench.sqlite3')
+
+    import django
+    django.setup()
+
+    from django.test.utils import setup_test_environment
+    # Lets scripts drive the views through the test client
+    setup_test_environment()
+
+    if database:
+        from django.core.management import call_command
+        call_command('migrate', verbosity=0)
+
+
+def make_quiz(title='Benchmark quiz', questions=200, options=4):
+    """Quiz whose second option of every question is the correct one"""
+    from quiz import coherence
+    from quiz.models import Option, Question, Quiz
+
+    quiz = Quiz.objects.create(title=title)
+    coherence.create(quiz.pk)
+    created = Question.objects.bulk_create(
+        [Question(quiz=quiz, text=f'Question {number}?') for number in range(questions)]
+    )
+    Option.objects.bulk_create([
+        Option(question=question, text=f'Option {position}', is_correct=position == 1)
+        for question in created
+        for position in range(options)
+    ])
+    return quiz
+
+
+def best_of(func, number, repeat=5):
+    """Seconds per call of func(), best of `repeat` runs of `number` calls"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+class Measure:
+    """Wall time and number of queries of the block it wraps"""
+
+    def __init__(self, label):
+        self.label = label
+        self.queries = 0
+
+    def _count(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        from django.db import connection
+
+        self._wrapper = connection.execute_wrapper(self._count)
+        self._wrapper.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._started
+        self._wrapper.__exit__(*exc_info)
+        print(f'  {self.label:<28} {self.seconds * 1000:9.1f}ms  {self.queries:6d} queries')
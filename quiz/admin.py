@@ -1,3 +1,202 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 
-# Register your models here.
+from .models import Attempt, Option, Question, Quiz
+from . import bulk
+from . import cache as payload_cache
+from . import coherence
+from . import snapshots
+
+
+# Below this many rows an exact COUNT(*) is cheap enough to keep
+ESTIMATED_COUNT_THRESHOLD = getattr(settings, 'QUIZ_ADMIN_ESTIMATED_COUNT_THRESHOLD', 10000)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that reads the row count of an unfiltered changelist from
+    PostgreSQL's planner statistics instead of running COUNT(*) over the
+    whole table. Filtered lists and other databases count exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [connection.ops.quote_name(queryset.model._meta.db_table)]
+                )
+                row = cursor.fetchone()
+            # reltuples is -1 for a table that was never analyzed
+            if row and row[0] >= ESTIMATED_COUNT_THRESHOLD:
+                return int(row[0])
+
+        return super().count
+
+
+def _count_of(model, field):
+    """Per-row count of related rows as a correlated subquery"""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def _quizzes_changed(*quiz_ids):
+    """Same bookkeeping as the API's writes: new version, other workers told"""
+    snapshots.bump_version(*quiz_ids)
+    coherence.bump(*quiz_ids)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Skips the second, unfiltered COUNT(*) behind "N total"
+    show_full_result_count = False
+    list_per_page = 50
+    # Walks the primary key index; a stable order for pagination
+    ordering = ['-pk']
+
+
+@admin.register(Quiz)
+class QuizAdmin(LargeTableAdmin):
+    list_display = ['id', 'title', 'version', 'question_count', 'attempt_count', 'created_at']
+    search_fields = ['title']
+    readonly_fields = ['version', 'created_at']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            question_count=_count_of(Question, 'quiz'),
+            attempt_count=_count_of(Attempt, 'quiz')
+        )
+
+    @admin.display(description='Questions', ordering='question_count')
+    def question_count(self, obj):
+        return obj.question_count
+
+    @admin.display(description='Attempts', ordering='attempt_count')
+    def attempt_count(self, obj):
+        return obj.attempt_count
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Only the edited fields: `version` is read-only here, and writing
+            # back the value loaded with the form would undo a concurrent bump
+            obj.save(update_fields=form.changed_data)
+            _quizzes_changed(obj.pk)
+            obj.refresh_from_db(fields=['version'])
+        else:
+            super().save_model(request, obj, form, change)
+            coherence.create(obj.pk)
+
+    def get_deleted_objects(self, objs, request):
+        """Summarize what a delete removes with counts instead of listing every row"""
+        quiz_ids = [obj.pk for obj in objs]
+        model_count = {
+            Quiz._meta.verbose_name_plural: len(quiz_ids),
+            Question._meta.verbose_name_plural: Question.objects.filter(quiz_id__in=quiz_ids).count(),
+            Option._meta.verbose_name_plural: Option.objects.filter(question__quiz_id__in=quiz_ids).count(),
+            Attempt._meta.verbose_name_plural: Attempt.objects.filter(quiz_id__in=quiz_ids).count(),
+        }
+        perms_needed = {
+            model._meta.verbose_name
+            for model in (Question, Option)
+            if not request.user.has_perm(f'{model._meta.app_label}.delete_{model._meta.model_name}')
+        }
+        return [str(obj) for obj in objs], model_count, perms_needed, []
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, [obj])
+
+    def delete_queryset(self, request, queryset):
+        for quiz in queryset:
+            bulk.delete_quiz(quiz.pk)
+            payload_cache.purge(quiz.pk, quiz.version)
+            snapshots.forget(quiz.pk)
+
+
+class OptionInline(admin.TabularInline):
+    model = Option
+    fields = ['text', 'is_correct']
+    extra = 0
+    max_num = 6
+
+
+@admin.register(Question)
+class QuestionAdmin(LargeTableAdmin):
+    list_display = ['id', 'short_text', 'quiz', 'option_count', 'created_at']
+    list_select_related = ['quiz']
+    autocomplete_fields = ['quiz']
+    search_fields = ['text']
+    readonly_fields = ['created_at']
+    inlines = [OptionInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(option_count=_count_of(Option, 'question'))
+
+    @admin.display(description='Text')
+    def short_text(self, obj):
+        return str(obj)
+
+    @admin.display(description='Options', ordering='option_count')
+    def option_count(self, obj):
+        return obj.option_count
+
+    def save_model(self, request, obj, form, change):
+        old_quiz_id = form.initial.get('quiz') if change else None
+        super().save_model(request, obj, form, change)
+        _quizzes_changed(*{obj.quiz_id, old_quiz_id} - {None})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        _quizzes_changed(obj.quiz_id)
+
+    def delete_queryset(self, request, queryset):
+        quiz_ids = set(queryset.values_list('quiz_id', flat=True))
+        super().delete_queryset(request, queryset)
+        if quiz_ids:
+            _quizzes_changed(*quiz_ids)
+
+
+@admin.register(Option)
+class OptionAdmin(LargeTableAdmin):
+    list_display = ['id', 'text', 'question', 'is_correct']
+    list_select_related = ['question']
+    list_filter = ['is_correct']
+    raw_id_fields = ['question']
+    search_fields = ['text']
+
+    def save_model(self, request, obj, form, change):
+        old_question_id = form.initial.get('question') if change else None
+        super().save_model(request, obj, form, change)
+        quiz_ids = set(
+            Question.objects.filter(pk__in={obj.question_id, old_question_id} - {None})
+            .values_list('quiz_id', flat=True)
+        )
+        _quizzes_changed(*quiz_ids)
+
+    def delete_model(self, request, obj):
+        quiz_id = obj.question.quiz_id
+        super().delete_model(request, obj)
+        _quizzes_changed(quiz_id)
+
+    def delete_queryset(self, request, queryset):
+        quiz_ids = set(queryset.values_list('question__quiz_id', flat=True))
+        super().delete_queryset(request, queryset)
+        if quiz_ids:
+            _quizzes_changed(*quiz_ids)
@@ -0,0 +1,202 @@
+"""
+Psychometric item analysis of a quiz version.
+
+Attempts are streamed in id-ordered chunks. Each chunk's packed answer
+sheets become one NumPy response matrix (attempts x questions) of option
+positions, which is folded into running sums: per-item correct counts,
+the cross product of item scores with total scores, and per-option
+selection counts and score sums. Every statistic below follows from
+those sums, so memory stays proportional to the number of questions
+rather than the number of attempts.
+"""
+import numpy as np
+from django.conf import settings
+
+from .models import Attempt
+from . import sheets
+from . import snapshots
+
+
+ANALYSIS_CHUNK_SIZE = getattr(settings, 'QUIZ_ANALYSIS_CHUNK_SIZE', 5000)
+
+UNANSWERED = 0
+
+
+def _round(value, digits=4):
+    """JSON-safe float: undefined statistics (NaN) become None"""
+    value = float(value)
+    return None if value != value else round(value, digits)
+
+
+class Layout:
+    """Option positions of one version, for turning sheets into codes"""
+
+    def __init__(self, snapshot, answer_key):
+        questions = snapshot.take['data'] if snapshot.take else []
+        self.questions = questions
+        self.count = len(questions)
+        # Position 0 is "unanswered"; options are numbered from 1
+        self.width = 1 + max((len(question['options']) for question in questions), default=0)
+
+        ids, positions = [], []
+        for question in questions:
+            for position, option in enumerate(question['options'], 1):
+                ids.append(option['id'])
+                positions.append(position)
+
+        # Same dtype as the sheets, so ids compare without a float cast
+        option_ids = np.array(ids, dtype=np.uint64)
+        order = np.argsort(option_ids, kind='stable')
+        self.option_ids = option_ids[order]
+        self.positions = np.array(positions, dtype=np.uint8)[order]
+
+        # Position of each question's correct option; `width` never occurs
+        # in a sheet, so questions without a key are never correct
+        key = np.full(self.count, self.width, dtype=np.uint8)
+        for index, question in enumerate(questions):
+            correct = answer_key.get(question['id'])
+            for position, option in enumerate(question['options'], 1):
+                if option['id'] == correct:
+                    key[index] = position
+        self.key = key
+
+    def codes(self, blobs):
+        """Response matrix of option positions for a list of sheets"""
+        raw = np.frombuffer(b''.join(blobs), dtype='<u8').reshape(len(blobs), self.count)
+        if not len(self.option_ids):
+            return np.zeros(raw.shape, dtype=np.uint8)
+
+        index = np.searchsorted(self.option_ids, raw).clip(max=len(self.option_ids) - 1)
+        return np.where(self.option_ids[index] == raw, self.positions[index], UNANSWERED).astype(np.uint8)
+
+
+class Accumulator:
+    """Running sums of the response matrices seen so far"""
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.attempts = 0
+        self.correct = np.zeros(layout.count, dtype=np.int64)
+        self.item_total = np.zeros(layout.count, dtype=np.int64)
+        self.total_sum = 0
+        self.total_squares = 0
+        self.option_counts = np.zeros(layout.count * layout.width, dtype=np.int64)
+        self.option_totals = np.zeros(layout.count * layout.width, dtype=np.float64)
+        self._offsets = np.arange(layout.count, dtype=np.int64) * layout.width
+
+    def add(self, codes):
+        correct = codes == self.layout.key
+        totals = correct.sum(axis=1, dtype=np.int64)
+
+        self.attempts += len(codes)
+        self.correct += correct.sum(axis=0, dtype=np.int64)
+        self.item_total += totals @ correct
+        self.total_sum += int(totals.sum())
+        self.total_squares += int((totals * totals).sum())
+
+        cells = (codes + self._offsets).ravel()
+        size = len(self.option_counts)
+        self.option_counts += np.bincount(cells, minlength=size)
+        self.option_totals += np.bincount(
+            cells, weights=np.repeat(totals, self.layout.count), minlength=size
+        )
+
+    def report(self):
+        layout = self.layout
+        n = self.attempts
+        k = layout.count
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            difficulty = self.correct / n
+            mean = self.total_sum / n if n else float('nan')
+            variance = self.total_squares / n - mean * mean if n else float('nan')
+            item_variance = difficulty * (1 - difficulty)
+            covariance = self.item_total / n - difficulty * mean
+            # Item vs. rest of the test, so an item doesn't correlate with itself
+            rest_variance = variance - 2 * covariance + item_variance
+            discrimination = (covariance - item_variance) / np.sqrt(item_variance * rest_variance)
+            alpha = (
+                k / (k - 1) * (1 - item_variance.sum() / variance)
+                if k > 1 and variance > 0 else float('nan')
+            )
+            counts = self.option_counts.reshape(k, layout.width)
+            option_means = self.option_totals.reshape(k, layout.width) / counts
+
+        items = []
+        for index, question in enumerate(layout.questions):
+            items.append({
+                'question_id': question['id'],
+                'text': question['text'],
+                'difficulty': _round(difficulty[index]),
+                'discrimination': _round(discrimination[index]),
+                'unanswered': int(counts[index, UNANSWERED]),
+                'options': [
+                    {
+                        'option_id': option['id'],
+                        'text': option['text'],
+                        'is_correct': bool(position == layout.key[index]),
+                        'count': int(counts[index, position]),
+                        'proportion': _round(counts[index, position] / n if n else float('nan')),
+                        # Mean total score of the attempts choosing this option
+                        'mean_score': _round(option_means[index, position]),
+                    }
+                    for position, option in enumerate(question['options'], 1)
+                ],
+            })
+
+        return {
+            'attempts': n,
+            'questions': k,
+            'mean_score': _round(mean),
+            'score_std': _round(np.sqrt(variance)) if n else None,
+            'cronbach_alpha': _round(alpha),
+            'items': items,
+        }
+
+
+def analysis_version(quiz):
+    """Latest version of a quiz that has attempts, else its current version"""
+    return (
+        Attempt.objects.filter(quiz_id=quiz.pk)
+        .order_by('-version')
+        .values_list('version', flat=True)
+        .first()
+    ) or quiz.version
+
+
+def analyze(quiz, version=None, chunk_size=ANALYSIS_CHUNK_SIZE):
+    """
+    Item statistics of the attempts answered against one quiz version.
+
+    Items are scored with the current answer key where the question still
+    exists (as regrading does), otherwise with the version's own key.
+    Returns None if the version has no snapshot.
+    """
+    if version is None:
+        version = analysis_version(quiz)
+
+    snapshot = snapshots.get_snapshot(quiz, version)
+    if snapshot is None:
+        return None
+
+    current = snapshots.get_snapshot(quiz)
+    layout = Layout(snapshot, {**snapshot.answer_key, **current.answer_key})
+    accumulator = Accumulator(layout)
+    sheet_size = layout.count * sheets.ITEMSIZE
+
+    cursor = 0
+    while True:
+        rows = list(
+            Attempt.objects.filter(quiz_id=quiz.pk, version=version, id__gt=cursor)
+            .order_by('id')
+            .values_list('id', 'answer_sheet')[:chunk_size]
+        )
+        if not rows:
+            break
+
+        cursor = rows[-1][0]
+        blobs = [sheet for _, sheet in rows if len(sheet) == sheet_size]
+        if blobs and layout.count:
+            accumulator.add(layout.codes(blobs))
+
+    return {'quiz_id': quiz.pk, 'version': version, **accumulator.report()}
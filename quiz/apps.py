@@ -1,6 +1,41 @@
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+# Programs that run management commands rather than serve requests
+_COMMAND_PROGRAMS = {'manage.py', 'django-admin'}
+
+
+def _runs_commands(program):
+    name = os.path.basename(program)
+    if name == '__main__.py':
+        # `python -m django`, but not `python -m gunicorn` or `-m uvicorn`
+        return os.path.basename(os.path.dirname(program)) == 'django'
+    return name in _COMMAND_PROGRAMS
+
+
+def _serving():
+    """False in management commands (migrate, shell, warm_caches...) other than runserver"""
+    if not _runs_commands(sys.argv[0]):
+        return True
+    if sys.argv[1:2] != ['runserver']:
+        return False
+    # The autoreloader's parent process only watches files
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
 
 
 class QuizConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quiz'
+
+    def ready(self):
+        # Opt-in: preload caches so a fresh worker's first requests are warm
+        if getattr(settings, 'QUIZ_WARM_ON_STARTUP', False) and _serving():
+            from .warmup import warm_on_startup
+            threading.Thread(
+                target=warm_on_startup, name='quiz-warmup', daemon=True
+            ).start()
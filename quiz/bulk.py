@@ -0,0 +1,82 @@
+"""
+Set-based quiz cloning and deletion.
+
+Cloning copies a quiz's questions and options with chunked `bulk_create`
+calls inside one transaction, streaming the source rows as tuples instead
+of model instances. Deleting issues one `DELETE ... WHERE` per table,
+children first, rather than going through Django's cascade collector,
+which loads every question and option of the quiz into memory before
+deleting them. None of these models have delete signals to skip.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, router, transaction
+
+from .models import Attempt, Option, Question, Quiz, QuizGeneration, QuizSnapshot
+from . import coherence
+
+
+CLONE_CHUNK_SIZE = getattr(settings, 'QUIZ_CLONE_CHUNK_SIZE', 1000)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def clone_quiz(quiz, title, chunk_size=CLONE_CHUNK_SIZE):
+    """Copy a quiz with its questions and options; attempts are not copied"""
+    with transaction.atomic():
+        clone = Quiz.objects.create(title=title)
+        coherence.create(clone.pk)
+
+        source_ids = []
+        clone_ids = []
+        questions = (
+            Question.objects.filter(quiz_id=quiz.pk)
+            .order_by('id')
+            .values_list('id', 'text')
+        )
+        for chunk in _chunks(questions.iterator(chunk_size=chunk_size), chunk_size):
+            created = Question.objects.bulk_create(
+                [Question(quiz_id=clone.pk, text=text) for _, text in chunk]
+            )
+            source_ids.extend(question_id for question_id, _ in chunk)
+            clone_ids.extend(question.pk for question in created)
+
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # Ids were assigned in insertion order, which follows the source's
+            clone_ids = list(
+                Question.objects.filter(quiz_id=clone.pk)
+                .order_by('id')
+                .values_list('id', flat=True)
+            )
+        question_map = dict(zip(source_ids, clone_ids))
+
+        options = (
+            Option.objects.filter(question__quiz_id=quiz.pk)
+            .order_by('question_id', 'id')
+            .values_list('question_id', 'text', 'is_correct')
+        )
+        for chunk in _chunks(options.iterator(chunk_size=chunk_size), chunk_size):
+            Option.objects.bulk_create([
+                Option(question_id=question_map[question_id], text=text, is_correct=is_correct)
+                for question_id, text, is_correct in chunk
+            ])
+
+    return clone
+
+
+def delete_quiz(quiz_id):
+    """Delete a quiz and everything hanging off it without loading any rows"""
+    using = router.db_for_write(Quiz)
+    with transaction.atomic(using=using):
+        deleted = Option.objects.filter(question__quiz_id=quiz_id)._raw_delete(using)
+        deleted += Question.objects.filter(quiz_id=quiz_id)._raw_delete(using)
+        deleted += Attempt.objects.filter(quiz_id=quiz_id)._raw_delete(using)
+        deleted += QuizSnapshot.objects.filter(quiz_id=quiz_id)._raw_delete(using)
+        deleted += QuizGeneration.objects.filter(quiz_id=quiz_id)._raw_delete(using)
+        deleted += Quiz.objects.filter(pk=quiz_id)._raw_delete(using)
+    return deleted
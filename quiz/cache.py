@@ -0,0 +1,166 @@
+"""
+Rendered payload cache for the quiz endpoints.
+
+The `take` and `retrieve` payloads are rendered to JSON once and stored
+together with pre-compressed variants, so a cache hit only has to pick the
+variant matching the client's Accept-Encoding instead of re-rendering and
+re-compressing the same bytes on every request. Entries are keyed by quiz
+version, so a write that bumps the version retires every variant at once.
+"""
+import gzip
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+from . import metrics
+from . import singleflight
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+TAKE = 'take'
+DETAIL = 'detail'
+KINDS = (TAKE, DETAIL)
+
+IDENTITY = 'identity'
+GZIP = 'gzip'
+BROTLI = 'br'
+
+# Preferred order when the client accepts several encodings equally
+ENCODING_PREFERENCE = (BROTLI, GZIP, IDENTITY)
+
+PAYLOAD_TIMEOUT = getattr(settings, 'QUIZ_PAYLOAD_CACHE_TIMEOUT', 300)
+
+# Below this size compression saves less than the header overhead
+MIN_COMPRESS_SIZE = getattr(settings, 'QUIZ_PAYLOAD_MIN_COMPRESS_SIZE', 512)
+
+
+def payload_key(kind, quiz_id, version):
+    """Cache key of the rendered payload variants for a quiz version"""
+    return f'quiz:payload:{kind}:{quiz_id}:{version}'
+
+
+def build_variants(data):
+    """Render data to JSON and compress it with every available encoding"""
+    body = JSONRenderer().render(data)
+    variants = {IDENTITY: body}
+
+    if len(body) >= MIN_COMPRESS_SIZE:
+        variants[GZIP] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            variants[BROTLI] = brotli.compress(body, quality=11)
+
+    return variants
+
+
+def get_variants(kind, quiz_id, version, builder):
+    """
+    Return the cached variants for a payload, building them on a miss.
+
+    `builder` returns the payload data, or None when there is nothing to
+    cache (the miss is then not stored and None is returned).
+    """
+    key = payload_key(kind, quiz_id, version)
+    variants = cache.get(key)
+
+    metrics.PAYLOAD_CACHE.inc(kind=kind, result='miss' if variants is None else 'hit')
+
+    if variants is None:
+        # Concurrent misses of the same payload share one build
+        variants = singleflight.loads.do(('payload', key), lambda: _fill(key, builder))
+
+    return variants
+
+
+def _fill(key, builder):
+    # A build that finished just before this one started may have stored it
+    variants = cache.get(key)
+    if variants is not None:
+        return variants
+
+    data = builder()
+    if data is None:
+        return None
+
+    variants = build_variants(data)
+    cache.set(key, variants, PAYLOAD_TIMEOUT)
+    return variants
+
+
+def purge(quiz_id, max_version):
+    """
+    Drop every cached payload of a deleted quiz.
+
+    Nothing reads them once the quiz is gone, so this only frees the
+    space now instead of leaving the entries to expire.
+    """
+    cache.delete_many([
+        payload_key(kind, quiz_id, version)
+        for kind in KINDS
+        for version in range(1, max_version + 1)
+    ])
+
+
+def negotiate_encoding(accept_encoding, available):
+    """
+    Pick the best available encoding for an Accept-Encoding header value.
+
+    Honours q-values (including q=0 refusals) and the `*` wildcard; falls
+    back to identity, which is always available.
+    """
+    qvalues = {}
+
+    for item in (accept_encoding or '').split(','):
+        parts = item.strip().split(';')
+        coding = parts[0].strip().lower()
+        if not coding:
+            continue
+
+        q = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[coding] = q
+
+    wildcard = qvalues.get('*')
+    best, best_q = IDENTITY, 0.0
+
+    for coding in ENCODING_PREFERENCE:
+        if coding not in available:
+            continue
+
+        q = qvalues.get(coding, wildcard)
+        if q is None:
+            # Identity is acceptable unless explicitly refused
+            q = 0.001 if coding == IDENTITY else 0.0
+
+        if q > best_q:
+            best, best_q = coding, q
+
+    return best
+
+
+def variant_response(request, variants, status=200):
+    """Build a JSON response from the variant matching the request"""
+    encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING'), variants)
+
+    response = HttpResponse(
+        variants[encoding],
+        content_type='application/json',
+        status=status
+    )
+    if encoding != IDENTITY:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+
+    return response
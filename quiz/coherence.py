@@ -0,0 +1,137 @@
+"""
+Cross-worker coherence for process-local quiz caches.
+
+Every write to a quiz (or its questions and options) bumps the quiz's
+`QuizGeneration` row in the same transaction. Each worker remembers the
+generation its cached entries were loaded at and validates all of them at
+once with a single batched query, at most once per
+QUIZ_COHERENCE_INTERVAL seconds; entries whose generation moved on (or
+whose quiz was deleted) are dropped instead of being refetched eagerly.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import QuizGeneration
+from . import cache as payload_cache
+from . import snapshots
+
+
+COHERENCE_INTERVAL = getattr(settings, 'QUIZ_COHERENCE_INTERVAL', 1.0)
+COHERENCE_CACHE_SIZE = getattr(settings, 'QUIZ_COHERENCE_CACHE_SIZE', 1024)
+
+# Keeps the IN (...) list of one validation query well under SQLite's limit
+VALIDATE_BATCH_SIZE = 500
+
+
+def bump(*quiz_ids):
+    """Mark the quizzes as changed; call inside the write's transaction"""
+    updated = QuizGeneration.objects.filter(quiz_id__in=quiz_ids).update(
+        generation=F('generation') + 1
+    )
+    if updated < len(set(quiz_ids)):
+        # Quizzes created outside the API have no counter yet
+        QuizGeneration.objects.bulk_create(
+            [QuizGeneration(quiz_id=quiz_id, generation=1) for quiz_id in quiz_ids],
+            ignore_conflicts=True
+        )
+
+    # The writing worker sees its own change at once; others within an interval
+    transaction.on_commit(lambda: quizzes.discard(*quiz_ids))
+
+
+def create(quiz_id):
+    """Start the counter of a new quiz"""
+    QuizGeneration.objects.create(quiz_id=quiz_id)
+
+
+def current_generation(quiz_id):
+    """Generation of a quiz, or None if it has no counter yet"""
+    return (
+        QuizGeneration.objects.filter(quiz_id=quiz_id)
+        .values_list('generation', flat=True)
+        .first()
+    )
+
+
+def ensure_generation(quiz_id):
+    """Create the counter of a quiz that has none"""
+    QuizGeneration.objects.get_or_create(quiz_id=quiz_id)
+
+
+class QuizCache:
+    """Process-local quiz_id -> Quiz cache validated against QuizGeneration"""
+
+    def __init__(self, interval=COHERENCE_INTERVAL, maxsize=COHERENCE_CACHE_SIZE):
+        self.interval = interval
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._validated_at = 0.0
+
+    def get(self, quiz_id):
+        self.validate()
+        with self._lock:
+            entry = self._entries.get(quiz_id)
+        return None if entry is None else entry[1]
+
+    def set(self, quiz_id, generation, quiz):
+        """Cache a quiz read *after* its generation was read"""
+        with self._lock:
+            self._entries[quiz_id] = (generation, quiz)
+            self._entries.move_to_end(quiz_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def validate(self, force=False):
+        """Drop entries changed in another worker, throttled to one check per interval"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._validated_at < self.interval:
+                return
+            # Claimed before querying so concurrent requests don't all check
+            self._validated_at = now
+            known = {quiz_id: generation for quiz_id, (generation, _) in self._entries.items()}
+
+        if not known:
+            return
+
+        ids = list(known)
+        current = {}
+        for start in range(0, len(ids), VALIDATE_BATCH_SIZE):
+            current.update(
+                QuizGeneration.objects.filter(quiz_id__in=ids[start:start + VALIDATE_BATCH_SIZE])
+                .values_list('quiz_id', 'generation')
+            )
+
+        deleted = []
+        with self._lock:
+            for quiz_id, generation in known.items():
+                entry = self._entries.get(quiz_id)
+                if entry is None or entry[0] != generation:
+                    continue
+                if current.get(quiz_id) != generation:
+                    del self._entries[quiz_id]
+                    if quiz_id not in current:
+                        deleted.append(entry[1])
+
+        for quiz in deleted:
+            # Nothing will read the deleted quiz's entries again; free them now
+            payload_cache.purge(quiz.pk, quiz.version)
+            snapshots.forget(quiz.pk)
+
+    def discard(self, *quiz_ids):
+        with self._lock:
+            for quiz_id in quiz_ids:
+                self._entries.pop(quiz_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+quizzes = QuizCache()
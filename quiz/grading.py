@@ -0,0 +1,147 @@
+"""
+Attempt storage and bulk regrading.
+
+Regrading streams a quiz's attempts in id-ordered chunks, scores each
+chunk in memory against one loaded answer key and writes the scores back
+with a single `bulk_update` per chunk. An attempt records the version
+whose answer key graded it, so an interrupted regrade simply resumes with
+the attempts that are still behind.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Max, Min
+
+from .models import Attempt
+from . import sheets
+from . import snapshots
+
+
+REGRADE_CHUNK_SIZE = getattr(settings, 'QUIZ_REGRADE_CHUNK_SIZE', 1000)
+
+
+def record_attempt(quiz_id, version, sheet, score, total):
+    """Store a scored submission with its packed answer sheet"""
+    return Attempt.objects.create(
+        quiz_id=quiz_id,
+        version=version,
+        score=score,
+        total=total,
+        graded_version=version,
+        answer_sheet=sheet
+    )
+
+
+def pending_attempts(quiz_id, version):
+    """Attempts of a quiz not yet graded against the given version"""
+    return Attempt.objects.filter(quiz_id=quiz_id).exclude(graded_version=version)
+
+
+def regrade_range(quiz_id, version, keys, first_id, last_id,
+                  chunk_size=REGRADE_CHUNK_SIZE, progress=None):
+    """
+    Regrade the pending attempts with first_id <= id <= last_id.
+
+    `keys` maps each answered version to the answer key laid out in that
+    version's sheet order. Returns the number of attempts regraded;
+    `progress` is called with the size of every chunk written.
+    """
+    regraded = 0
+    cursor = first_id - 1
+
+    while True:
+        attempts = list(
+            pending_attempts(quiz_id, version)
+            .filter(id__gt=cursor, id__lte=last_id)
+            .order_by('id')
+            .only('id', 'version', 'answer_sheet', 'score', 'graded_version')[:chunk_size]
+        )
+        if not attempts:
+            break
+
+        cursor = attempts[-1].id
+        # Attempts of a version without a snapshot can't be laid out; they
+        # are left pending
+        attempts = [attempt for attempt in attempts if attempt.version in keys]
+
+        for attempt in attempts:
+            attempt.score = sheets.score(attempt.answer_sheet, keys[attempt.version])
+            attempt.graded_version = version
+
+        Attempt.objects.bulk_update(attempts, ['score', 'graded_version'])
+
+        regraded += len(attempts)
+        if progress is not None:
+            progress(len(attempts))
+
+    return regraded
+
+
+def _init_worker():
+    # Spawned workers start without Django; forked ones already have it
+    import django
+    django.setup()
+
+
+def _regrade_slice(args):
+    return regrade_range(*args)
+
+
+def regrade_quiz(quiz, workers=1, chunk_size=REGRADE_CHUNK_SIZE, progress=None):
+    """
+    Re-score every attempt of a quiz against its current answer key.
+
+    With workers > 1 the pending id range is split into slices regraded
+    by a process pool. Returns the number of attempts regraded.
+    """
+    answer_key = snapshots.get_snapshot(quiz).answer_key
+    version = quiz.version
+    pending = pending_attempts(quiz.pk, version)
+
+    bounds = pending.aggregate(first_id=Min('id'), last_id=Max('id'))
+    if bounds['first_id'] is None:
+        return 0
+
+    first_id, last_id = bounds['first_id'], bounds['last_id']
+
+    # Sheets are laid out in the question order of the version they were
+    # answered against, so lay the answer key out once per such version.
+    # Questions deleted since keep the key they were answered with rather
+    # than scoring nothing against an unchanged total.
+    keys = {}
+    for answered_version in pending.values_list('version', flat=True).distinct():
+        snapshot = snapshots.get_snapshot(quiz, answered_version)
+        if snapshot is not None:
+            keys[answered_version] = sheets.key_vector(
+                snapshot.question_ids, {**snapshot.answer_key, **answer_key}
+            )
+
+    if workers <= 1:
+        return regrade_range(
+            quiz.pk, version, keys, first_id, last_id, chunk_size, progress
+        )
+
+    # Several slices per worker so progress is reported as slices finish
+    slice_count = workers * 4
+    step = max((last_id - first_id + 1) // slice_count, 1)
+    slices = []
+    start = first_id
+    while start <= last_id:
+        end = min(start + step - 1, last_id)
+        slices.append((quiz.pk, version, keys, start, end, chunk_size))
+        start = end + 1
+
+    # Children must open their own connections rather than share ours
+    connections.close_all()
+
+    regraded = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = [executor.submit(_regrade_slice, args) for args in slices]
+        for future in as_completed(futures):
+            count = future.result()
+            regraded += count
+            if progress is not None and count:
+                progress(count)
+
+    return regraded
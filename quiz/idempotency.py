@@ -0,0 +1,118 @@
+"""
+Idempotency-Key handling for retried requests.
+
+Responses are stored in Django's cache under the client's Idempotency-Key,
+so a retry is answered with the stored response instead of running the
+request again. The first request claims the key with `cache.add()`, which
+is atomic on every cache backend; a duplicate arriving while it runs polls
+until the response is stored. Every entry carries a hash of the request
+body, and a key reused with a different body is rejected, not replayed.
+
+Duplicates are only caught across worker processes when CACHES points at
+a shared backend (Redis, Memcached, the database); with the default
+local-memory cache each process deduplicates on its own.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+
+IDEMPOTENCY_TTL = getattr(settings, 'QUIZ_IDEMPOTENCY_TTL', 3600)
+# Lifetime of a claim whose request died before storing its response
+IDEMPOTENCY_CLAIM_TIMEOUT = getattr(settings, 'QUIZ_IDEMPOTENCY_CLAIM_TIMEOUT', 30)
+# How long a duplicate waits for the request holding the claim
+IDEMPOTENCY_WAIT = getattr(settings, 'QUIZ_IDEMPOTENCY_WAIT', 10.0)
+POLL_INTERVAL = 0.05
+MAX_KEY_LENGTH = 255
+
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+PENDING = 'pending'
+DONE = 'done'
+
+
+def fingerprint(data):
+    """Hash of a parsed request body, independent of key order and whitespace"""
+    if hasattr(data, 'lists'):  # QueryDict of a form-encoded body
+        data = dict(data.lists())
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class IdempotencyCache:
+    """(status, data) responses stored in Django's cache, claimed with cache.add()"""
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL, claim_timeout=IDEMPOTENCY_CLAIM_TIMEOUT,
+                 wait=IDEMPOTENCY_WAIT, prefix='quiz:idempotency'):
+        self.ttl = ttl
+        self.claim_timeout = claim_timeout
+        self.wait = wait
+        self.prefix = prefix
+
+    def _cache_key(self, key):
+        # Client keys are arbitrary text; hashed to suit every backend's key rules
+        return f'{self.prefix}:{hashlib.sha256(repr(key).encode()).hexdigest()}'
+
+    def run(self, key, body_hash, view):
+        """
+        Return the stored response for key, or call view() to produce it.
+
+        Only successful responses are stored, so a request rejected by
+        validation can be corrected and retried under the same key.
+        """
+        cache_key = self._cache_key(key)
+        deadline = time.monotonic() + self.wait
+
+        while True:
+            if cache.add(cache_key, (PENDING, body_hash), self.claim_timeout):
+                return self._produce(cache_key, body_hash, view)
+
+            entry = cache.get(cache_key)
+            if entry is None:
+                # Released or expired since the claim attempt; claim it again
+                continue
+
+            state, stored_hash, *stored = entry
+            if stored_hash != body_hash:
+                return Response(
+                    {
+                        'error': 'Idempotency-Key was already used with a different request body'
+                    },
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+
+            if state == DONE:
+                status_code, data = stored
+                response = Response(data, status=status_code)
+                response[REPLAYED_HEADER] = 'true'
+                return response
+
+            if time.monotonic() >= deadline:
+                return Response(
+                    {
+                        'error': 'A request with this Idempotency-Key is still in progress'
+                    },
+                    status=status.HTTP_409_CONFLICT
+                )
+            time.sleep(POLL_INTERVAL)
+
+    def _produce(self, cache_key, body_hash, view):
+        try:
+            response = view()
+        except BaseException:
+            cache.delete(cache_key)
+            raise
+
+        if status.is_success(response.status_code):
+            cache.set(cache_key, (DONE, body_hash, response.status_code, response.data), self.ttl)
+        else:
+            cache.delete(cache_key)
+        return response
+
+
+submissions = IdempotencyCache()
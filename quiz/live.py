@@ -0,0 +1,241 @@
+"""
+Live contest results pushed over Server-Sent Events.
+
+One in-process broadcaster per watched quiz keeps the submission count,
+score distribution and top-N attempts. `submit` (a sync view, possibly on
+another thread) only updates that state under a lock; the broadcaster's
+task on the event loop serializes it once per tick when something changed
+and fans the same event out to every subscriber. Each subscriber has a
+small bounded queue, and a client too slow to drain it is dropped rather
+than buffered.
+"""
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Case, Count, F, FloatField, IntegerField, Max, Value, When
+from django.db.models.functions import Cast, Floor, Least
+
+from .models import Attempt
+from . import singleflight
+
+
+LIVE_TICK = getattr(settings, 'QUIZ_LIVE_TICK', 1.0)
+LIVE_TOP_N = getattr(settings, 'QUIZ_LIVE_TOP_N', 10)
+LIVE_QUEUE_SIZE = getattr(settings, 'QUIZ_LIVE_QUEUE_SIZE', 8)
+LIVE_KEEPALIVE = getattr(settings, 'QUIZ_LIVE_KEEPALIVE', 15.0)
+
+DISTRIBUTION_BUCKETS = 10
+
+# Queued in place of the backlog of a dropped subscriber
+DROPPED = None
+
+
+def _bucket(score, total):
+    if not total:
+        return 0
+    return min(score * DISTRIBUTION_BUCKETS // total, DISTRIBUTION_BUCKETS - 1)
+
+
+def _rank(entry):
+    # Best percentage first, earliest attempt first among equals
+    attempt_id, score, total = entry
+    return (-(score / total if total else 0), attempt_id)
+
+
+# SQL counterparts of _bucket() and _rank(), for the initial load
+_BUCKET = Case(
+    When(total=0, then=Value(0)),
+    default=Least(
+        Floor(F('score') * DISTRIBUTION_BUCKETS / F('total')),
+        Value(DISTRIBUTION_BUCKETS - 1)
+    ),
+    output_field=IntegerField()
+)
+_RATIO = Case(
+    When(total=0, then=Value(0.0)),
+    default=Cast('score', FloatField()) / Cast('total', FloatField()),
+    output_field=FloatField()
+)
+
+
+class QuizBroadcaster:
+    def __init__(self, quiz_id, tick=LIVE_TICK, top_n=LIVE_TOP_N):
+        self.quiz_id = quiz_id
+        self.tick = tick
+        self.top_n = top_n
+        self.subscribers = set()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._pending = []
+        self._submissions = 0
+        self._distribution = [0] * DISTRIBUTION_BUCKETS
+        self._top = []
+        self._dirty = False
+        self._task = None
+        self._stopped = False
+
+    def _apply(self, attempt_id, score, total):
+        self._submissions += 1
+        self._distribution[_bucket(score, total)] += 1
+        self._top.append((attempt_id, score, total))
+        self._top.sort(key=_rank)
+        del self._top[self.top_n:]
+        self._dirty = True
+
+    def publish(self, attempt_id, score, total):
+        """Record a scored attempt; safe to call from any thread"""
+        with self._lock:
+            if self._loaded:
+                self._apply(attempt_id, score, total)
+            else:
+                self._pending.append((attempt_id, score, total))
+
+    def _load(self):
+        """Initial state from the database: aggregates, not every attempt row"""
+        attempts = Attempt.objects.filter(quiz_id=self.quiz_id)
+        last_id = attempts.aggregate(last_id=Max('id'))['last_id'] or 0
+        # Every query stops at the same attempt, so they agree with each other
+        attempts = attempts.filter(id__lte=last_id)
+
+        buckets = list(
+            attempts.order_by()
+            .values(bucket=_BUCKET)
+            .annotate(count=Count('id'))
+            .values_list('bucket', 'count')
+        )
+        top = list(
+            attempts.annotate(ratio=_RATIO)
+            .order_by('-ratio', 'id')
+            .values_list('id', 'score', 'total')[:self.top_n]
+        )
+
+        with self._lock:
+            for bucket, count in buckets:
+                self._distribution[int(bucket)] += count
+                self._submissions += count
+            self._top = top
+            self._dirty = bool(top)
+            # Submissions that raced with the load and aren't in it yet
+            for row in self._pending:
+                if row[0] > last_id:
+                    self._apply(*row)
+            self._pending = []
+            self._loaded = True
+
+    def event(self):
+        with self._lock:
+            self._dirty = False
+            data = {
+                'quiz_id': self.quiz_id,
+                'submissions': self._submissions,
+                'distribution': list(self._distribution),
+                'top': [
+                    {'attempt_id': attempt_id, 'score': score, 'total': total}
+                    for attempt_id, score, total in self._top
+                ],
+            }
+        return f'event: results\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+    @property
+    def started(self):
+        return self._task is not None
+
+    async def start(self):
+        await sync_to_async(self._load)()
+        # Stopped while loading: every waiting subscriber gave up
+        if not self._stopped:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            if not self._dirty:
+                continue
+
+            message = self.event()
+            for queue in list(self.subscribers):
+                try:
+                    queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    self.subscribers.discard(queue)
+                    # Make room for the sentinel so the stream can end
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(DROPPED)
+
+    def stop(self):
+        self._stopped = True
+        if self._task is not None:
+            self._task.cancel()
+
+
+_broadcasters = {}
+
+
+def publish(quiz_id, attempt_id, score, total):
+    """Forward a scored attempt to the quiz's broadcaster, if it is watched"""
+    broadcaster = _broadcasters.get(quiz_id)
+    if broadcaster is not None:
+        broadcaster.publish(attempt_id, score, total)
+
+
+async def subscribe(quiz_id, queue_size=LIVE_QUEUE_SIZE):
+    """Register a subscriber queue, starting the quiz's broadcaster if needed"""
+    broadcaster = _broadcasters.get(quiz_id)
+    if broadcaster is None:
+        broadcaster = QuizBroadcaster(quiz_id)
+        # Visible to publish() right away, so no submission is missed
+        _broadcasters[quiz_id] = broadcaster
+
+    if not broadcaster.started:
+        # Subscribers arriving together share one initial load
+        try:
+            await singleflight.loads.ado(('live', quiz_id), broadcaster.start)
+        except BaseException:
+            # Failed, timed out or cancelled: don't leave a broadcaster with
+            # no subscribers behind, nor let the running load start its task
+            _release(broadcaster)
+            raise
+
+        if broadcaster._stopped:
+            # Released by a subscriber that gave up while this one waited
+            return await subscribe(quiz_id, queue_size)
+
+    queue = asyncio.Queue(maxsize=queue_size)
+    queue.put_nowait(broadcaster.event())
+    broadcaster.subscribers.add(queue)
+    return broadcaster, queue
+
+
+def _release(broadcaster):
+    """Stop and unregister a broadcaster that has no subscribers left"""
+    if not broadcaster.subscribers:
+        if _broadcasters.get(broadcaster.quiz_id) is broadcaster:
+            del _broadcasters[broadcaster.quiz_id]
+        broadcaster.stop()
+
+
+def unsubscribe(broadcaster, queue):
+    broadcaster.subscribers.discard(queue)
+    _release(broadcaster)
+
+
+async def stream(broadcaster, queue, keepalive=LIVE_KEEPALIVE):
+    """SSE body of one subscriber"""
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+
+            if message is DROPPED:
+                yield 'event: dropped\ndata: {}\n\n'
+                return
+            yield message
+    finally:
+        unsubscribe(broadcaster, queue)
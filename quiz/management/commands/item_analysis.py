@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.analytics import ANALYSIS_CHUNK_SIZE, analyze
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = (
+        'Compute item difficulty, point-biserial discrimination, Cronbach\'s '
+        'alpha and per-option distractor statistics for a quiz version.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_id', type=int)
+        parser.add_argument(
+            '--quiz-version', type=int,
+            help='Quiz version to analyze (default: latest version with attempts).'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=ANALYSIS_CHUNK_SIZE,
+            help='Attempts loaded per batch.'
+        )
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Print the full report as JSON.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            quiz = Quiz.objects.get(pk=options['quiz_id'])
+        except Quiz.DoesNotExist:
+            raise CommandError(f"Quiz {options['quiz_id']} does not exist.")
+
+        report = analyze(quiz, options['quiz_version'], options['chunk_size'])
+
+        if report is None:
+            raise CommandError(f"Quiz version {options['quiz_version']} is not available.")
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f'"{quiz.title}" version {report["version"]}: {report["attempts"]} attempts, '
+            f'{report["questions"]} questions, mean score {report["mean_score"]}, '
+            f'alpha {report["cronbach_alpha"]}'
+        )
+        self.stdout.write(f'  {"question":>10}  {"difficulty":>10}  {"discrim.":>10}  {"unanswered":>10}')
+        for item in report['items']:
+            self.stdout.write(
+                f'  {item["question_id"]:>10}  {_format(item["difficulty"]):>10}  '
+                f'{_format(item["discrimination"]):>10}  {item["unanswered"]:>10}'
+            )
+
+
+def _format(value):
+    return '-' if value is None else f'{value:.3f}'
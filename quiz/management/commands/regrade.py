@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.grading import REGRADE_CHUNK_SIZE, pending_attempts, regrade_quiz
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-score a quiz's stored attempts against its current answer key. "
+        "Safe to re-run: an interrupted regrade resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_id', type=int)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Number of worker processes regrading id ranges in parallel.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=REGRADE_CHUNK_SIZE,
+            help='Attempts loaded and written back per batch.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            quiz = Quiz.objects.get(pk=options['quiz_id'])
+        except Quiz.DoesNotExist:
+            raise CommandError(f"Quiz {options['quiz_id']} does not exist.")
+
+        pending = pending_attempts(quiz.pk, quiz.version).count()
+        if not pending:
+            self.stdout.write(f'All attempts of "{quiz.title}" are graded against version {quiz.version}.')
+            return
+
+        self.stdout.write(f'Regrading {pending} attempts of "{quiz.title}" against version {quiz.version}...')
+        done = 0
+
+        def progress(count):
+            nonlocal done
+            done += count
+            self.stdout.write(f'  {done}/{pending} ({done * 100 // pending}%)')
+
+        regraded = regrade_quiz(
+            quiz,
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            progress=progress
+        )
+        self.stdout.write(self.style.SUCCESS(f'Regraded {regraded} attempts.'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from quiz.warmup import WARM_QUIZ_COUNT, warm
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the snapshots and rendered take payloads of the most recent '
+        'quizzes, reporting the time taken. Snapshots are stored in the '
+        'database; payloads outlive this command only in a shared cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count', type=int, default=WARM_QUIZ_COUNT,
+            help='Number of most recent quizzes to preload.'
+        )
+
+    def handle(self, *args, **options):
+        # This process exits afterwards, so warming its URLconf would be lost
+        timings = warm(options['count'], urls=False)
+
+        for name, seconds, items in timings:
+            self.stdout.write(f'  {name:<12} {items:>5}  {seconds * 1000:8.1f}ms')
+
+        total = sum(seconds for _, seconds, _ in timings)
+        self.stdout.write(self.style.SUCCESS(f'Caches warmed in {total * 1000:.1f}ms.'))
@@ -0,0 +1,273 @@
+"""
+In-process metrics for the quiz API, exposed in Prometheus text format.
+
+Counters and histograms are plain dictionaries updated under a lock. When
+QUIZ_METRICS_DIR is set, every process also writes its values to its own
+file in that directory (throttled to QUIZ_METRICS_FLUSH_INTERVAL), and a
+scrape sums the files of all processes, so any gunicorn worker can serve
+`/metrics` for the whole server.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.http import Http404
+from django.template.response import SimpleTemplateResponse
+from rest_framework.exceptions import APIException
+
+
+METRICS_DIR = getattr(settings, 'QUIZ_METRICS_DIR', None)
+FLUSH_INTERVAL = getattr(settings, 'QUIZ_METRICS_FLUSH_INTERVAL', 1.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _labelvalues(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, labelvalues, extra=()):
+        pairs = list(zip(self.labelnames, labelvalues)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry.update(self.name, self._labelvalues(labels), self._add, amount)
+
+    @staticmethod
+    def _add(value, amount):
+        return (value or 0) + amount
+
+    @staticmethod
+    def merge(value, other):
+        return value + other
+
+    def render(self, values):
+        for labelvalues, value in sorted(values.items()):
+            yield f'{self.name}{self._format_labels(labelvalues)} {value}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, amount, **labels):
+        self.registry.update(self.name, self._labelvalues(labels), self._observe, amount)
+
+    def _observe(self, value, amount):
+        # Per-bucket counts (not cumulative) followed by sum and count
+        if value is None:
+            value = [0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if amount <= bound:
+                value[index] += 1
+                break
+        value[-2] += amount
+        value[-1] += 1
+        return value
+
+    @staticmethod
+    def merge(value, other):
+        return [a + b for a, b in zip(value, other)]
+
+    def render(self, values):
+        for labelvalues, value in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, value):
+                cumulative += count
+                labels = self._format_labels(labelvalues, [('le', bound)])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = self._format_labels(labelvalues, [('le', '+Inf')])
+            yield f'{self.name}_bucket{labels} {value[-1]}'
+            yield f'{self.name}_sum{self._format_labels(labelvalues)} {value[-2]}'
+            yield f'{self.name}_count{self._format_labels(labelvalues)} {value[-1]}'
+
+
+class Registry:
+    def __init__(self, directory=METRICS_DIR, flush_interval=FLUSH_INTERVAL):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Called again after a fork: the child must not re-count the
+        # parent's values or write to the parent's file
+        self._pid = os.getpid()
+        self._values = {}
+        self._last_flush = 0.0
+        self._filename = f'quiz_metrics_{self._pid}_{uuid.uuid4().hex[:8]}.json'
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = self.metrics[name] = Counter(self, name, documentation, labelnames)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = self.metrics[name] = Histogram(self, name, documentation, labelnames, buckets)
+        return metric
+
+    def update(self, name, labelvalues, func, amount):
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._reset()
+            values = self._values.setdefault(name, {})
+            values[labelvalues] = func(values.get(labelvalues), amount)
+
+            if self.directory is not None:
+                now = time.monotonic()
+                if now - self._last_flush >= self.flush_interval:
+                    self._flush()
+                    self._last_flush = now
+
+    def _flush(self):
+        data = {
+            name: [[list(labelvalues), value] for labelvalues, value in values.items()]
+            for name, values in self._values.items()
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / self._filename
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(data))
+        os.replace(tmp_path, path)
+
+    def collect(self):
+        """Values of every process sharing the metrics directory, summed"""
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._reset()
+            if self.directory is None:
+                return {name: dict(values) for name, values in self._values.items()}
+            self._flush()
+            self._last_flush = time.monotonic()
+
+        merged = {}
+        for path in self.directory.glob('quiz_metrics_*.json'):
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+
+            for name, entries in data.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                values = merged.setdefault(name, {})
+                for labelvalues, value in entries:
+                    key = tuple(labelvalues)
+                    values[key] = metric.merge(values[key], value) if key in values else value
+
+        return merged
+
+    def render(self):
+        collected = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            lines.extend(metric.render(collected.get(name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'quiz_requests_total', 'Requests handled per action and status.', ['action', 'status']
+)
+REQUEST_LATENCY = registry.histogram(
+    'quiz_request_duration_seconds', 'Request latency per action.', ['action']
+)
+REQUEST_QUERIES = registry.histogram(
+    'quiz_request_db_queries', 'Database queries per request.', ['action'], QUERY_BUCKETS
+)
+RESPONSE_SIZE = registry.histogram(
+    'quiz_response_size_bytes', 'Response payload size per action.', ['action'], SIZE_BUCKETS
+)
+PAYLOAD_CACHE = registry.counter(
+    'quiz_payload_cache_requests_total', 'Rendered payload cache lookups.', ['kind', 'result']
+)
+ANSWERS_SCORED = registry.counter(
+    'quiz_answers_scored_total', 'Answers scored by submit.'
+)
+SCORING_LATENCY = registry.histogram(
+    'quiz_scoring_duration_seconds', 'Time spent scoring one submission.'
+)
+SINGLE_FLIGHT = registry.counter(
+    'quiz_single_flight_calls_total', 'Coalesced loads, by whether the call ran or shared the load.', ['role']
+)
+
+
+def _exception_status(exc):
+    if isinstance(exc, Http404):
+        return 404
+    if isinstance(exc, APIException):
+        return exc.status_code
+    return 500
+
+
+def _observe_size(action, response):
+    if getattr(response, 'streaming', False):
+        return
+    if isinstance(response, SimpleTemplateResponse) and not response.is_rendered:
+        # DRF renders the Response after the view returns
+        response.add_post_render_callback(
+            lambda rendered: RESPONSE_SIZE.observe(len(rendered.content), action=action)
+        )
+    else:
+        RESPONSE_SIZE.observe(len(response.content), action=action)
+
+
+def instrument(action):
+    """Record latency, query count, size and status of a view (or view method)"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            queries = 0
+
+            def count_query(execute, sql, params, many, context):
+                nonlocal queries
+                queries += 1
+                return execute(sql, params, many, context)
+
+            start = time.perf_counter()
+            try:
+                with connection.execute_wrapper(count_query):
+                    response = view(*args, **kwargs)
+            except Exception as exc:
+                REQUESTS.inc(action=action, status=_exception_status(exc))
+                raise
+            finally:
+                REQUEST_LATENCY.observe(time.perf_counter() - start, action=action)
+                REQUEST_QUERIES.observe(queries, action=action)
+
+            REQUESTS.inc(action=action, status=response.status_code)
+            _observe_size(action, response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_generations(apps, schema_editor):
+    Quiz = apps.get_model('quiz', 'Quiz')
+    QuizGeneration = apps.get_model('quiz', 'QuizGeneration')
+    QuizGeneration.objects.bulk_create(
+        [QuizGeneration(quiz_id=quiz_id) for quiz_id in Quiz.objects.values_list('id', flat=True)],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0003_attempts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizGeneration',
+            fields=[
+                ('quiz', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='generation_counter', serialize=False, to='quiz.quiz')),
+                ('generation', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_generations, migrations.RunPython.noop),
+    ]
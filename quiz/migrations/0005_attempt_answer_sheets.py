@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:17
+
+import json
+import sys
+import zlib
+from array import array
+
+from django.db import migrations, models
+
+
+# Little-endian uint64 option ids, as written by quiz/sheets.py
+TYPECODE = 'Q'
+ITEMSIZE = 8
+assert array(TYPECODE).itemsize == ITEMSIZE
+
+
+def pack_answer_sheets(apps, schema_editor):
+    """Pack the answer rows of every attempt into its answer sheet"""
+    Attempt = apps.get_model('quiz', 'Attempt')
+    AttemptAnswer = apps.get_model('quiz', 'AttemptAnswer')
+    QuizSnapshot = apps.get_model('quiz', 'QuizSnapshot')
+
+    layouts = {}
+
+    def layout(quiz_id, version):
+        # (question_id -> slot, question_id -> offered option ids) of a version
+        key = (quiz_id, version)
+        if key not in layouts:
+            blob = (
+                QuizSnapshot.objects.filter(quiz_id=quiz_id, version=version)
+                .values_list('data', flat=True).first()
+            )
+            data = json.loads(zlib.decompress(bytes(blob))) if blob is not None else {}
+            question_ids = [int(question_id) for question_id in data.get('answer_key', {})]
+            options = {
+                question['id']: {option['id'] for option in question['options']}
+                for question in ((data.get('take') or {}).get('data') or ())
+            }
+            layouts[key] = ({question_id: index for index, question_id in enumerate(question_ids)}, options)
+        return layouts[key]
+
+    cursor = 0
+    while True:
+        attempts = list(
+            Attempt.objects.filter(id__gt=cursor).order_by('id')
+            .only('id', 'quiz_id', 'version')[:1000]
+        )
+        if not attempts:
+            break
+
+        answers = {}
+        for attempt_id, question_id, option_id in AttemptAnswer.objects.filter(
+            attempt_id__in=[attempt.id for attempt in attempts]
+        ).values_list('attempt_id', 'question_id', 'option_id'):
+            answers.setdefault(attempt_id, []).append((question_id, option_id))
+
+        for attempt in attempts:
+            positions, options = layout(attempt.quiz_id, attempt.version)
+            sheet = array(TYPECODE, bytes(ITEMSIZE * len(positions)))
+            for question_id, option_id in answers.get(attempt.id, ()):
+                index = positions.get(question_id)
+                if index is not None and option_id in options.get(question_id, ()):
+                    sheet[index] = option_id
+            if sys.byteorder != 'little':
+                sheet.byteswap()
+            attempt.answer_sheet = sheet.tobytes()
+
+        Attempt.objects.bulk_update(attempts, ['answer_sheet'])
+        cursor = attempts[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0004_quiz_generations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='answer_sheet',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(pack_answer_sheets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:18
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0005_attempt_answer_sheets'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='AttemptAnswer',
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:02
+
+import json
+import sys
+import zlib
+from array import array
+
+from django.db import migrations
+
+
+# Sheets were packed as uint32 before option ids (64-bit) outgrew them
+NARROW = ('I', 4)
+WIDE = ('Q', 8)
+assert array(NARROW[0]).itemsize == NARROW[1] and array(WIDE[0]).itemsize == WIDE[1]
+
+
+def _resize(apps, source, target):
+    """Repack every sheet still in the source width into the target width"""
+    Attempt = apps.get_model('quiz', 'Attempt')
+    QuizSnapshot = apps.get_model('quiz', 'QuizSnapshot')
+
+    counts = {}
+
+    def slot_count(quiz_id, version):
+        # A sheet has one slot per question of its version; the byte length
+        # alone can't tell two narrow slots from one wide one
+        key = (quiz_id, version)
+        if key not in counts:
+            blob = (
+                QuizSnapshot.objects.filter(quiz_id=quiz_id, version=version)
+                .values_list('data', flat=True).first()
+            )
+            counts[key] = len(json.loads(zlib.decompress(bytes(blob)))['answer_key']) if blob is not None else None
+        return counts[key]
+
+    cursor = 0
+    while True:
+        attempts = list(
+            Attempt.objects.filter(id__gt=cursor).order_by('id')
+            .only('id', 'quiz_id', 'version', 'answer_sheet')[:1000]
+        )
+        if not attempts:
+            break
+        cursor = attempts[-1].id
+
+        changed = []
+        for attempt in attempts:
+            count = slot_count(attempt.quiz_id, attempt.version)
+            blob = bytes(attempt.answer_sheet)
+            if not count or len(blob) != count * source[1]:
+                continue
+
+            sheet = array(source[0])
+            sheet.frombytes(blob)
+            if sys.byteorder != 'little':
+                sheet.byteswap()
+            sheet = array(target[0], sheet)
+            if sys.byteorder != 'little':
+                sheet.byteswap()
+            attempt.answer_sheet = sheet.tobytes()
+            changed.append(attempt)
+
+        Attempt.objects.bulk_update(changed, ['answer_sheet'])
+
+
+def widen_answer_sheets(apps, schema_editor):
+    _resize(apps, NARROW, WIDE)
+
+
+def narrow_answer_sheets(apps, schema_editor):
+    # Raises OverflowError if an option id no longer fits in 32 bits
+    _resize(apps, WIDE, NARROW)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0006_delete_attemptanswer'),
+    ]
+
+    operations = [
+        migrations.RunPython(widen_answer_sheets, narrow_answer_sheets),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 
 class Quiz(models.Model):
     title = models.CharField(max_length=200)
+    version = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -25,4 +26,48 @@ class Option(models.Model):
     is_correct = models.BooleanField(default=False)
     
     def __str__(self):
-        return self.text
\ No newline at end of file
+        return self.text
+
+
+class QuizSnapshot(models.Model):
+    """Immutable serialized take payload and answer key of one quiz version"""
+    quiz = models.ForeignKey(Quiz, related_name='snapshots', on_delete=models.CASCADE)
+    version = models.PositiveIntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['quiz', 'version'], name='unique_quiz_snapshot_version'),
+        ]
+    
+    def __str__(self):
+        return f'{self.quiz_id} v{self.version}'
+
+
+class QuizGeneration(models.Model):
+    """Per-quiz write counter workers check to validate their local caches"""
+    quiz = models.OneToOneField(
+        Quiz, primary_key=True, related_name='generation_counter', on_delete=models.CASCADE
+    )
+    generation = models.PositiveBigIntegerField(default=0)
+    
+    def __str__(self):
+        return f'{self.quiz_id}: {self.generation}'
+
+
+class Attempt(models.Model):
+    """A scored quiz submission"""
+    quiz = models.ForeignKey(Quiz, related_name='attempts', on_delete=models.CASCADE)
+    version = models.PositiveIntegerField()
+    score = models.PositiveIntegerField()
+    total = models.PositiveIntegerField()
+    # Quiz version whose answer key produced the current score
+    graded_version = models.PositiveIntegerField()
+    # Packed option ids in the canonical question order of `version`
+    # (see quiz/sheets.py)
+    answer_sheet = models.BinaryField(default=b'')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f'{self.quiz_id}: {self.score}/{self.total}'
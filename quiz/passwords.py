@@ -0,0 +1,93 @@
+"""
+Password hashing off the request thread.
+
+PBKDF2 is deliberately slow, so a burst of logins can pin every worker.
+Hashing runs on a small bounded thread pool instead (hashlib releases the
+GIL while hashing); once the pool and its queue are full, new requests are
+rejected straight away with `Saturated`, which the views turn into a 503
+with Retry-After rather than letting requests pile up.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+HASHING_WORKERS = getattr(settings, 'QUIZ_HASHING_WORKERS', os.cpu_count() or 1)
+HASHING_QUEUE_DEPTH = getattr(settings, 'QUIZ_HASHING_QUEUE_DEPTH', HASHING_WORKERS * 2)
+RETRY_AFTER = getattr(settings, 'QUIZ_HASHING_RETRY_AFTER', 1)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with a work factor set by QUIZ_PBKDF2_ITERATIONS.
+
+    Keeps the `pbkdf2_sha256` algorithm name, so existing hashes still
+    verify and are rehashed on the next successful login whenever the
+    iteration count changes.
+    """
+    iterations = getattr(
+        settings, 'QUIZ_PBKDF2_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations
+    )
+
+
+class Saturated(Exception):
+    """Raised when the hashing pool and its queue are full"""
+
+
+class HashingExecutor:
+    def __init__(self, workers=HASHING_WORKERS, queue_depth=HASHING_QUEUE_DEPTH):
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='quiz-hashing'
+        )
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+
+    def run(self, func, *args):
+        """Run func on the pool and wait for its result, or raise Saturated"""
+        if not self._slots.acquire(blocking=False):
+            raise Saturated()
+
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+
+executor = HashingExecutor()
+
+
+def _verify(password, encoded):
+    rehash = []
+    valid = hashers.check_password(password, encoded, setter=rehash.append)
+    return valid, bool(rehash)
+
+
+def make_password(password):
+    """Hash a password on the hashing pool"""
+    return executor.run(hashers.make_password, password)
+
+
+def verify_password(user, password):
+    """
+    Check a user's password on the hashing pool.
+
+    On success, a hash made with outdated settings (e.g. a different
+    QUIZ_PBKDF2_ITERATIONS) is transparently replaced.
+    """
+    valid, rehash = executor.run(_verify, password, user.password)
+
+    if valid and rehash:
+        try:
+            user.password = make_password(password)
+        except Saturated:
+            # Not worth failing a valid login for; retried on the next one
+            return valid
+        user.save(update_fields=['password'])
+
+    return valid
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import User
+from django.db.models import Count, Q
 from rest_framework import serializers
 from .models import Quiz, Question, Option
+from . import passwords
 class AdminRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
     password_confirm = serializers.CharField(write_only=True, min_length=8)
@@ -9,6 +11,8 @@ class AdminRegistrationSerializer(serializers.ModelSerializer):
         model = User
         fields = ['username', 'email', 'password', 'password_confirm', 'first_name', 'last_name']
         extra_kwargs = {
+            # Uniqueness is checked by the single query in validate()
+            'username': {'validators': [User.username_validator]},
             'first_name': {'required': False},
             'last_name': {'required': False},
             'email': {'required': True}
@@ -20,14 +24,20 @@ class AdminRegistrationSerializer(serializers.ModelSerializer):
                 'password': 'Passwords must match'
             })
         
-        # Check if username already exists
-        if User.objects.filter(username=data['username']).exists():
+        # Check if username or email already exists, in a single query
+        taken = User.objects.filter(
+            Q(username=data['username']) | Q(email=data['email'])
+        ).aggregate(
+            username=Count('pk', filter=Q(username=data['username'])),
+            email=Count('pk', filter=Q(email=data['email']))
+        )
+        
+        if taken['username']:
             raise serializers.ValidationError({
                 'username': 'Username already exists'
             })
         
-        # Check if email already exists
-        if User.objects.filter(email=data['email']).exists():
+        if taken['email']:
             raise serializers.ValidationError({
                 'email': 'Email already exists'
             })
@@ -37,15 +47,17 @@ class AdminRegistrationSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password_confirm')
         
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data['email'],
-            password=validated_data['password'],
+        # Hash on the bounded hashing pool; raises passwords.Saturated when full
+        user = User(
+            username=User.normalize_username(validated_data['username']),
+            email=User.objects.normalize_email(validated_data['email']),
             first_name=validated_data.get('first_name', ''),
             last_name=validated_data.get('last_name', ''),
             is_staff=True,  # Make user admin/staff
             is_active=True
         )
+        user.password = passwords.make_password(validated_data['password'])
+        user.save()
         
         return user
     
@@ -110,6 +122,16 @@ class QuizSerializer(serializers.ModelSerializer):
         """
         return data
     
+    def update(self, instance, validated_data):
+        """
+        Write only the submitted fields; a full-row save would put back the
+        version loaded with the instance and undo a concurrent bump
+        """
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+    
 
 class OptionSerializer(serializers.ModelSerializer):
     text = serializers.CharField(
@@ -145,8 +167,13 @@ class OptionSerializer(serializers.ModelSerializer):
         return value
 
 
+class NestedOptionSerializer(OptionSerializer):
+    """Option inside a question write; an existing option is referenced by id"""
+    id = serializers.IntegerField(required=False)
+
+
 class QuestionCreateSerializer(serializers.ModelSerializer):
-    options = OptionSerializer(many=True, required=True)
+    options = NestedOptionSerializer(many=True, required=True)
     text = serializers.CharField(
         required=True,
         allow_blank=False,
@@ -210,21 +237,49 @@ class QuestionCreateSerializer(serializers.ModelSerializer):
         if correct_count > 1:
             raise serializers.ValidationError("Only one option can be marked as correct.")
         
+        option_ids = [opt['id'] for opt in value if 'id' in opt]
+        if len(option_ids) != len(set(option_ids)):
+            raise serializers.ValidationError("Each option id can only be listed once.")
+        
         return value
     
     def validate(self, data):
         """Object-level validation"""
-        quiz = data.get('quiz')
-        text = data.get('text', '').strip()
+        quiz = data.get('quiz', getattr(self.instance, 'quiz', None))
+        text = data.get('text', getattr(self.instance, 'text', '')).strip()
         
         # Check if question with same text already exists in this quiz
-        if Question.objects.filter(quiz=quiz, text__iexact=text).exists():
+        duplicates = Question.objects.filter(quiz=quiz, text__iexact=text)
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
             raise serializers.ValidationError({
                 'text': 'A question with this text already exists in this quiz.'
             })
         
+        if 'options' in data:
+            self._validate_option_ids(data['options'])
+        
         return data
     
+    def _validate_option_ids(self, options):
+        """Option ids must name options of the question being updated"""
+        # Current values, kept so update() only writes options that changed
+        self._current_options = {} if self.instance is None else {
+            option_id: (text, is_correct)
+            for option_id, text, is_correct in
+            self.instance.options.values_list('id', 'text', 'is_correct')
+        }
+        
+        unknown = sorted(
+            opt['id'] for opt in options
+            if 'id' in opt and opt['id'] not in self._current_options
+        )
+        if unknown:
+            raise serializers.ValidationError({
+                'options': f'Options {unknown} do not belong to this question.'
+            })
+    
     def create(self, validated_data):
         """Create question with options"""
         options_data = validated_data.pop('options')
@@ -234,6 +289,36 @@ class QuestionCreateSerializer(serializers.ModelSerializer):
             Option.objects.create(question=question, **option_data)
         
         return question
+    
+    def update(self, instance, validated_data):
+        """
+        Update question fields and apply the options list as a diff by id:
+        listed ids are updated in place, options without an id are added and
+        options left out are deleted.
+        """
+        options_data = validated_data.pop('options', None)
+        instance = super().update(instance, validated_data)
+        
+        if options_data is not None:
+            current = self._current_options
+            changed, added = [], []
+            
+            for opt in options_data:
+                if 'id' not in opt:
+                    added.append(Option(question=instance, text=opt['text'], is_correct=opt['is_correct']))
+                elif current[opt['id']] != (opt['text'], opt['is_correct']):
+                    changed.append(Option(id=opt['id'], question=instance, text=opt['text'], is_correct=opt['is_correct']))
+            
+            removed = set(current) - {opt['id'] for opt in options_data if 'id' in opt}
+            
+            if removed:
+                Option.objects.filter(question=instance, pk__in=removed).delete()
+            if changed:
+                Option.objects.bulk_update(changed, ['text', 'is_correct'])
+            if added:
+                Option.objects.bulk_create(added)
+        
+        return instance
 
 
 class QuestionDetailSerializer(serializers.ModelSerializer):
@@ -273,6 +358,13 @@ class AnswerSubmissionSerializer(serializers.Serializer):
             'empty': 'Answer list cannot be empty.'
         }
     )
+    version = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        error_messages={
+            'invalid': 'Quiz version must be an integer.'
+        }
+    )
     
     def validate_answers(self, value):
         """Validate answer format"""
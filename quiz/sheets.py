@@ -0,0 +1,115 @@
+"""
+Packed answer sheets.
+
+An attempt stores its answers as one fixed-width array of little-endian
+uint64 option ids (ids are 64-bit), one slot per question in the canonical (id) order of
+the quiz version it was answered against; 0 marks an unanswered question.
+Scoring a sheet compares it slot by slot with a key vector in the same
+order, reading the stored bytes in place through a `memoryview`.
+"""
+import operator
+import sys
+from array import array
+
+
+TYPECODE = 'Q'
+ITEMSIZE = 8
+UNANSWERED = 0
+
+# Never equal to a stored option id, so questions without a correct option
+# (or unanswered ones) never score
+NO_KEY = -1
+
+_NATIVE = sys.byteorder == 'little' and array(TYPECODE).itemsize == ITEMSIZE
+
+
+def encode(snapshot, answers):
+    """
+    Pack answers into a sheet for the snapshot's question order.
+
+    Answers to questions outside the version, or naming an option the
+    question did not offer, can never score and are stored as unanswered.
+    """
+    positions = {question_id: index for index, question_id in enumerate(snapshot.question_ids)}
+    sheet = array(TYPECODE, bytes(ITEMSIZE * len(positions)))
+
+    for answer in answers:
+        question_id = int(answer['question_id'])
+        option_id = int(answer['option_id'])
+        index = positions.get(question_id)
+        if index is not None and option_id in snapshot.options[question_id]:
+            sheet[index] = option_id
+
+    if not _NATIVE:
+        sheet.byteswap()
+    return sheet.tobytes()
+
+
+class InvalidSelections(ValueError):
+    """A positional submission that doesn't fit the snapshot"""
+
+
+_SELECTION_TYPES = frozenset((int, type(None)))
+
+
+def pack_selections(snapshot, selections):
+    """
+    Validate a positional submission and pack it into a sheet.
+
+    `selections` holds one option id per question in take order, with
+    null or 0 for an unanswered question. Length, element types and
+    option membership are each checked with a single C-level pass.
+    """
+    choices = snapshot.choices
+    if type(selections) is not list:
+        raise InvalidSelections('selections must be a list of option ids.')
+
+    if len(selections) != len(choices):
+        raise InvalidSelections(
+            f'selections must have {len(choices)} entries, one per question in take order.'
+        )
+
+    # bool is an int subclass, so compare exact types
+    if not _SELECTION_TYPES.issuperset(map(type, selections)):
+        raise InvalidSelections('Each selection must be an option id or null.')
+
+    if not all(map(frozenset.__contains__, choices, selections)):
+        index = next(
+            index for index, (allowed, option_id) in enumerate(zip(choices, selections))
+            if option_id not in allowed
+        )
+        raise InvalidSelections(
+            f'selections[{index}] is not an option of question {snapshot.question_ids[index]}.'
+        )
+
+    if None in selections:
+        selections = [UNANSWERED if option_id is None else option_id for option_id in selections]
+
+    sheet = array(TYPECODE, selections)
+    if not _NATIVE:
+        sheet.byteswap()
+    return sheet.tobytes()
+
+
+def decode(blob):
+    """Option ids of a sheet; zero-copy on little-endian platforms"""
+    if _NATIVE:
+        return memoryview(blob).cast(TYPECODE)
+
+    sheet = array(TYPECODE)
+    sheet.frombytes(blob)
+    sheet.byteswap()
+    return sheet
+
+
+def key_vector(question_ids, answer_key):
+    """Correct option per slot of a sheet laid out in question_ids order"""
+    return tuple(
+        NO_KEY if answer_key.get(question_id) is None else answer_key[question_id]
+        for question_id in question_ids
+    )
+
+
+def score(sheet, key):
+    """Number of slots answered with the key's option"""
+    return sum(map(operator.eq, decode(sheet), key))
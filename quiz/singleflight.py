@@ -0,0 +1,113 @@
+"""
+Single-flight coalescing of duplicate concurrent work.
+
+When many requests miss the same cold entry at once (a class opening a
+newly published quiz), only the first caller for a key runs the load; the
+others wait for it and share its result or its exception instead of all
+running the same queries. Threads wait on a per-key event; coroutines
+await one shared task per key and event loop. A waiter gives up with
+`Timeout` after QUIZ_SINGLE_FLIGHT_TIMEOUT seconds, while the load itself
+carries on for whoever is still waiting.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+
+from . import metrics
+
+
+SINGLE_FLIGHT_TIMEOUT = getattr(settings, 'QUIZ_SINGLE_FLIGHT_TIMEOUT', 10.0)
+
+LEADER = 'leader'
+SHARED = 'shared'
+
+
+class Timeout(Exception):
+    """Gave up waiting for another caller's load of the same key"""
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    """Collapse concurrent calls with the same key into one"""
+
+    def __init__(self, timeout=SINGLE_FLIGHT_TIMEOUT):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+
+    def do(self, key, func, timeout=None):
+        """
+        Return func(), or the result of the call already running for key.
+
+        An exception raised by func() is raised in every caller sharing
+        that call. The next call after it finishes runs func() again, so
+        results are shared only between overlapping calls.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        metrics.SINGLE_FLIGHT.inc(role=LEADER if leader else SHARED)
+
+        if leader:
+            try:
+                call.result = func()
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result
+
+        if not call.done.wait(self.timeout if timeout is None else timeout):
+            raise Timeout(f'Timed out waiting for the load of {key!r}')
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _finished(self, task_key):
+        task = self._tasks.pop(task_key)
+        # Retrieved here so an error nobody waited for isn't logged as lost
+        if not task.cancelled():
+            task.exception()
+
+    async def ado(self, key, func, timeout=None):
+        """
+        Async counterpart of do(): await func(), sharing one task per key.
+
+        The task is shielded, so a caller that is cancelled or times out
+        doesn't cancel the load for the others.
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        task = self._tasks.get(task_key)
+        leader = task is None
+        if leader:
+            task = self._tasks[task_key] = loop.create_task(func())
+            task.add_done_callback(lambda _: self._finished(task_key))
+
+        metrics.SINGLE_FLIGHT.inc(role=LEADER if leader else SHARED)
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(task), self.timeout if timeout is None else timeout
+            )
+        except asyncio.TimeoutError:
+            raise Timeout(f'Timed out waiting for the load of {key!r}')
+
+
+loads = Group()
@@ -0,0 +1,200 @@
+"""
+Immutable quiz version snapshots.
+
+Every change to a quiz's questions or options bumps `Quiz.version`. The
+first time a version is needed its take payload and answer key are
+serialized into a compact `QuizSnapshot` blob, so `take` and `submit`
+always work against one consistent version and (quiz_id, version) is a
+cache key that never needs invalidation.
+"""
+import json
+import threading
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch
+
+from .models import Quiz, Question, Option, QuizSnapshot
+from .serializers import QuizTakeSerializer
+from . import sheets
+from . import singleflight
+
+
+SNAPSHOT_CACHE_SIZE = getattr(settings, 'QUIZ_SNAPSHOT_CACHE_SIZE', 256)
+
+
+class Snapshot:
+    """Decoded snapshot of one quiz version"""
+    __slots__ = (
+        'quiz_id', 'version', 'take', 'answer_key', 'question_ids', 'options', 'key', 'choices'
+    )
+
+    def __init__(self, quiz_id, version, take, answer_key):
+        self.quiz_id = quiz_id
+        self.version = version
+        # Take payload, or None when the version has no questions
+        self.take = take
+        # question_id -> id of the correct option (None if unset)
+        self.answer_key = answer_key
+        # Canonical question order, as used by packed answer sheets
+        self.question_ids = list(answer_key)
+        # question_id -> ids of the options it offers
+        self.options = {
+            question['id']: frozenset(option['id'] for option in question['options'])
+            for question in (take['data'] if take else ())
+        }
+        # Answer key and accepted selections laid out in sheet order
+        self.key = sheets.key_vector(self.question_ids, answer_key)
+        self.choices = tuple(
+            self.options.get(question_id, frozenset()) | {None, sheets.UNANSWERED}
+            for question_id in self.question_ids
+        )
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_get(key):
+    with _cache_lock:
+        snapshot = _cache.get(key)
+        if snapshot is not None:
+            _cache.move_to_end(key)
+        return snapshot
+
+
+def _cache_put(key, snapshot):
+    with _cache_lock:
+        _cache[key] = snapshot
+        _cache.move_to_end(key)
+        while len(_cache) > SNAPSHOT_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def forget(quiz_id):
+    """Drop this process's cached snapshots of a (deleted) quiz"""
+    with _cache_lock:
+        for key in [key for key in _cache if key[0] == quiz_id]:
+            del _cache[key]
+
+
+def bump_version(*quiz_ids):
+    """Move the quizzes to a new version; call inside the write's transaction"""
+    Quiz.objects.filter(pk__in=quiz_ids).update(version=F('version') + 1)
+
+
+def canonical_questions(quiz_id):
+    """Questions of a quiz with their options, in canonical (id) order"""
+    return list(
+        Question.objects.filter(quiz_id=quiz_id)
+        .order_by('id')
+        .prefetch_related(Prefetch('options', queryset=Option.objects.order_by('id')))
+    )
+
+
+def encode(quiz, questions):
+    """Serialize the take payload and answer key of a quiz into a blob"""
+    take = None
+    if questions:
+        take = {
+            'message': 'Quiz questions retrieved successfully',
+            'quiz_title': quiz.title,
+            'version': quiz.version,
+            'total_questions': len(questions),
+            'data': QuizTakeSerializer(questions, many=True).data
+        }
+
+    answer_key = {}
+    for question in questions:
+        answer_key[question.id] = next(
+            (option.id for option in question.options.all() if option.is_correct),
+            None
+        )
+
+    data = {'take': take, 'answer_key': answer_key}
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode())
+
+
+def decode(quiz_id, version, blob):
+    """Deserialize a snapshot blob"""
+    data = json.loads(zlib.decompress(blob))
+    answer_key = {int(question_id): option_id for question_id, option_id in data['answer_key'].items()}
+    return Snapshot(quiz_id, version, data['take'], answer_key)
+
+
+def _build(quiz):
+    """
+    Build and store the snapshot of the quiz's current version.
+
+    Returns None if the version moved on while the rows were being read,
+    since they may already belong to the next version.
+    """
+    blob = encode(quiz, canonical_questions(quiz.pk))
+
+    if not Quiz.objects.filter(pk=quiz.pk, version=quiz.version).exists():
+        return None
+
+    try:
+        with transaction.atomic():
+            QuizSnapshot.objects.create(quiz_id=quiz.pk, version=quiz.version, data=blob)
+    except IntegrityError:
+        # Another worker stored this version first; its blob is equivalent
+        pass
+
+    return blob
+
+
+def _load(quiz, version):
+    """Read (building it if current) and cache one version's snapshot"""
+    key = (quiz.pk, version)
+    # A load that finished just before this one started may have cached it
+    snapshot = _cache_get(key)
+    if snapshot is not None:
+        return snapshot
+
+    blob = (
+        QuizSnapshot.objects.filter(quiz_id=quiz.pk, version=version)
+        .values_list('data', flat=True)
+        .first()
+    )
+
+    if blob is None:
+        if version != quiz.version:
+            return None
+
+        blob = _build(quiz)
+        if blob is None:
+            return None
+
+    snapshot = decode(quiz.pk, version, bytes(blob))
+    _cache_put(key, snapshot)
+    return snapshot
+
+
+def get_snapshot(quiz, version=None):
+    """
+    Return the snapshot of a quiz version (the current one by default).
+
+    Returns None for a version that was never snapshotted and is no longer
+    current, as its rows cannot be reconstructed. Concurrent misses of the
+    same version share one load.
+    """
+    current = version is None
+    if current:
+        version = quiz.version
+
+    key = (quiz.pk, version)
+    snapshot = _cache_get(key)
+    if snapshot is not None:
+        return snapshot
+
+    snapshot = singleflight.loads.do(('snapshot',) + key, lambda: _load(quiz, version))
+
+    if snapshot is None and current:
+        # The version moved on while it was being built
+        quiz.refresh_from_db(fields=['title', 'version'])
+        return get_snapshot(quiz)
+
+    return snapshot
@@ -1,3 +1,1272 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import zlib
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from .apps import _serving
+from .models import Attempt, Option, Question, Quiz, QuizGeneration, QuizSnapshot
+from . import analytics
+from . import bulk
+from . import cache as payload_cache
+from . import coherence
+from . import grading
+from . import idempotency
+from . import live
+from . import metrics
+from . import passwords
+from . import sheets
+from . import singleflight
+from . import snapshots
+from . import views
+from . import warmup
+
+
+def make_quiz(title='Capitals', questions=2, options=3):
+    """Quiz whose first option of every question is the correct one"""
+    quiz = Quiz.objects.create(title=title)
+    coherence.create(quiz.pk)
+    for number in range(questions):
+        question = Question.objects.create(quiz=quiz, text=f'Question {number}')
+        Option.objects.bulk_create([
+            Option(question=question, text=f'Option {position}', is_correct=position == 0)
+            for position in range(options)
+        ])
+    return quiz
+
+
+def reset_caches():
+    """Process-local caches outlive a test's rolled back rows (and their reused ids)"""
+    cache.clear()
+    coherence.quizzes.clear()
+    with snapshots._cache_lock:
+        snapshots._cache.clear()
+
+
+class QuizTestCase(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.addCleanup(reset_caches)
+        self.admin = User.objects.create_superuser('admin', password='secret-password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+
+class PayloadCompressionTests(QuizTestCase):
+    def test_negotiate_encoding(self):
+        available = {payload_cache.IDENTITY: b'', payload_cache.GZIP: b''}
+        cases = [
+            (None, payload_cache.IDENTITY),
+            ('', payload_cache.IDENTITY),
+            ('gzip', payload_cache.GZIP),
+            ('GZIP, deflate', payload_cache.GZIP),
+            ('br', payload_cache.IDENTITY),
+            ('gzip;q=0', payload_cache.IDENTITY),
+            ('gzip;q=0.5, identity;q=0.8', payload_cache.IDENTITY),
+            ('gzip;q=0.9, identity;q=0.1', payload_cache.GZIP),
+            ('*', payload_cache.GZIP),
+            ('*;q=0.2, gzip;q=0', payload_cache.IDENTITY),
+            ('gzip;q=abc', payload_cache.IDENTITY),
+        ]
+        for accept_encoding, expected in cases:
+            with self.subTest(accept_encoding=accept_encoding):
+                self.assertEqual(payload_cache.negotiate_encoding(accept_encoding, available), expected)
+
+        self.assertEqual(
+            payload_cache.negotiate_encoding('gzip', {payload_cache.IDENTITY: b''}), payload_cache.IDENTITY
+        )
+
+    def test_take_variants(self):
+        quiz = make_quiz(questions=20)
+        url = f'/api/quizzes/{quiz.pk}/take/'
+
+        plain = self.client.get(url)
+        compressed = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        refused = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+
+        for response in (plain, compressed, refused):
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertFalse(refused.has_header('Content-Encoding'))
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertEqual(json.loads(plain.content)['total_questions'], 20)
+
+
+class StaleVersionTests(QuizTestCase):
+    """Editing a quiz must never write back the version it was loaded with"""
+
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz()
+        # Loaded before another request adds a question and bumps the version
+        self.stale = Quiz.objects.get(pk=self.quiz.pk)
+        question = Question.objects.create(quiz=self.quiz, text='Added meanwhile')
+        Option.objects.create(question=question, text='Yes', is_correct=True)
+        snapshots.bump_version(self.quiz.pk)
+        coherence.bump(self.quiz.pk)
+        snapshots.get_snapshot(Quiz.objects.get(pk=self.quiz.pk))
+
+    def assert_renamed(self, instance):
+        quiz = Quiz.objects.get(pk=self.quiz.pk)
+        self.assertEqual(quiz.version, 3)
+        self.assertEqual(instance.version, 3)
+        take = snapshots.get_snapshot(quiz).take
+        self.assertEqual(take['quiz_title'], 'Renamed quiz')
+        self.assertEqual(take['total_questions'], 3)
+
+    def test_api_update(self):
+        from .serializers import QuizSerializer
+        from .views import QuizViewSet
+
+        serializer = QuizSerializer(self.stale, data={'title': 'Renamed quiz'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        QuizViewSet().perform_update(serializer)
+        self.assert_renamed(self.stale)
+
+    def test_admin_change(self):
+        model_admin = site._registry[Quiz]
+        request = RequestFactory().post('/')
+        request.user = self.admin
+        form_class = model_admin.get_form(request, self.stale, change=True)
+        form = form_class({'title': 'Renamed quiz'}, instance=self.stale)
+        self.assertTrue(form.is_valid(), form.errors)
+
+        model_admin.save_model(request, form.save(commit=False), form, change=True)
+        self.assert_renamed(self.stale)
+
+    def test_submit_scores_against_version_taken(self):
+        quiz = make_quiz(title='Pinned')
+        take = self.client.get(f'/api/quizzes/{quiz.pk}/take/').json()
+        answers = [
+            {'question_id': question['id'], 'option_id': question['options'][0]['id']}
+            for question in take['data']
+        ]
+
+        # An admin moves the first question's correct answer after the take
+        model_admin = site._registry[Option]
+        request = RequestFactory().post('/')
+        request.user = self.admin
+        first, second = Option.objects.filter(question_id=answers[0]['question_id']).order_by('id')[:2]
+        for option, is_correct in ((first, False), (second, True)):
+            form_class = model_admin.get_form(request, option, change=True)
+            form = form_class(
+                {'question': option.question_id, 'text': option.text, 'is_correct': is_correct},
+                instance=option
+            )
+            self.assertTrue(form.is_valid(), form.errors)
+            model_admin.save_model(request, form.save(commit=False), form, change=True)
+
+        url = f'/api/quizzes/{quiz.pk}/submit/'
+        pinned = self.client.post(url, {'version': take['version'], 'answers': answers}, format='json')
+        current = self.client.post(url, {'answers': answers}, format='json')
+
+        self.assertEqual(pinned.status_code, 200)
+        self.assertEqual(pinned.json()['version'], take['version'])
+        self.assertEqual(pinned.json()['score'], 2)
+        self.assertEqual(current.json()['version'], take['version'] + 2)
+        self.assertEqual(current.json()['score'], 1)
+
+
+class IdempotencyTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz()
+        self.url = f'/api/quizzes/{self.quiz.pk}/submit/'
+        self.answers = [
+            {'question_id': question.pk, 'option_id': question.options.order_by('id')[0].pk}
+            for question in self.quiz.questions.order_by('id')
+        ]
+
+    def submit(self, answers, key='retry-key'):
+        return self.client.post(
+            self.url, {'answers': answers}, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_is_replayed(self):
+        first = self.submit(self.answers)
+        retry = self.submit(self.answers)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(Attempt.objects.filter(quiz=self.quiz).count(), 1)
+
+    def test_reused_key_with_different_body(self):
+        self.submit(self.answers)
+        response = self.submit(self.answers[:1])
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Attempt.objects.filter(quiz=self.quiz).count(), 1)
+
+    def test_failed_request_releases_key(self):
+        self.assertEqual(self.submit([]).status_code, 400)
+        self.assertEqual(self.submit(self.answers).status_code, 200)
+
+    def test_key_claimed_elsewhere(self):
+        # Claimed by a request still running, e.g. in another worker
+        body_hash = idempotency.fingerprint({'answers': self.answers})
+        cache.add(
+            idempotency.submissions._cache_key((str(self.quiz.pk), 'retry-key')),
+            (idempotency.PENDING, body_hash)
+        )
+
+        with mock.patch.object(idempotency.submissions, 'wait', 0.1):
+            response = self.submit(self.answers)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Attempt.objects.exists())
+
+
+class AuthTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.registration = {
+            'username': 'editor',
+            'email': 'editor@example.com',
+            'password': 'long-enough',
+            'password_confirm': 'long-enough',
+        }
+
+    def test_registration_checks_uniqueness_in_one_query(self):
+        from .serializers import AdminRegistrationSerializer
+
+        User.objects.create_user('editor', email='editor@example.com')
+        with self.assertNumQueries(1):
+            serializer = AdminRegistrationSerializer(data=self.registration)
+            self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors, {'username': ['Username already exists']})
+
+        serializer = AdminRegistrationSerializer(data={**self.registration, 'username': 'other'})
+        with self.assertNumQueries(1):
+            self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors, {'email': ['Email already exists']})
+
+        serializer = AdminRegistrationSerializer(data={**self.registration, 'username': 'not valid!'})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(list(serializer.errors), ['username'])
+
+    def test_busy_hashing_pool_answers_503(self):
+        executor = passwords.HashingExecutor(workers=1, queue_depth=0)
+        self.addCleanup(executor._executor.shutdown)
+        started, release = threading.Event(), threading.Event()
+
+        def hold():
+            started.set()
+            release.wait(10)
+
+        holder = threading.Thread(target=executor.run, args=(hold,))
+        holder.start()
+        started.wait(10)
+        try:
+            with mock.patch.object(passwords, 'executor', executor):
+                login = self.client.post(
+                    '/api/auth/login/', {'username': 'admin', 'password': 'secret-password'}, format='json'
+                )
+                register = self.client.post('/api/auth/register/', self.registration, format='json')
+        finally:
+            release.set()
+            holder.join(10)
+
+        for response in (login, register):
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], str(passwords.RETRY_AFTER))
+        self.assertFalse(User.objects.filter(username='editor').exists())
+
+    def test_login_rehashes_after_iterations_change(self):
+        with mock.patch.object(passwords.PBKDF2PasswordHasher, 'iterations', 1000):
+            User.objects.create_user('editor', password='long-enough', is_staff=True)
+        url = '/api/auth/login/'
+
+        wrong = self.client.post(url, {'username': 'editor', 'password': 'wrong-one'}, format='json')
+        self.assertEqual(wrong.status_code, 401)
+        self.assertTrue(User.objects.get(username='editor').password.startswith('pbkdf2_sha256$1000$'))
+
+        response = self.client.post(url, {'username': 'editor', 'password': 'long-enough'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        encoded = User.objects.get(username='editor').password
+        iterations = passwords.PBKDF2PasswordHasher.iterations
+        self.assertTrue(encoded.startswith(f'pbkdf2_sha256${iterations}$'))
+        self.assertEqual(
+            self.client.post(url, {'username': 'editor', 'password': 'long-enough'}, format='json').status_code,
+            200
+        )
+        self.assertEqual(User.objects.get(username='editor').password, encoded)
+
+
+class WarmupTests(QuizTestCase):
+    def test_warm_fills_process_caches(self):
+        quiz = make_quiz()
+        timings = warmup.warm(quiz_count=5)
+
+        self.assertEqual([name for name, _, _ in timings], ['urls', 'quizzes'])
+        self.assertIsNotNone(coherence.quizzes.get(quiz.pk))
+        self.assertIsNotNone(snapshots._cache_get((quiz.pk, quiz.version)))
+        self.assertIsNotNone(cache.get(payload_cache.payload_key(payload_cache.TAKE, quiz.pk, quiz.version)))
+
+    def test_startup_only_when_serving(self):
+        cases = [
+            (['gunicorn', 'quiz_project.wsgi'], '', True),
+            (['/venv/lib/python3.11/site-packages/gunicorn/__main__.py', 'quiz_project.wsgi'], '', True),
+            (['/venv/lib/python3.11/site-packages/uvicorn/__main__.py', 'quiz_project.asgi:application'], '', True),
+            (['/venv/lib/python3.11/site-packages/django/__main__.py', 'migrate'], '', False),
+            (['/venv/lib/python3.11/site-packages/django/__main__.py', 'runserver', '--noreload'], '', True),
+            (['manage.py', 'runserver'], 'true', True),
+            (['manage.py', 'runserver', '--noreload'], '', True),
+            # The autoreloader's parent process
+            (['manage.py', 'runserver'], '', False),
+            (['manage.py', 'migrate'], '', False),
+            (['manage.py', 'warm_caches'], '', False),
+        ]
+        for argv, run_main, serving in cases:
+            with self.subTest(argv=argv, run_main=run_main), \
+                    mock.patch.object(sys, 'argv', argv), \
+                    mock.patch.dict(os.environ, {'RUN_MAIN': run_main}):
+                self.assertIs(_serving(), serving)
+
+
+class ItemAnalysisTests(QuizTestCase):
+    def test_report(self):
+        quiz = make_quiz(questions=2, options=3)
+        snapshot = snapshots.get_snapshot(quiz)
+        first, second = snapshot.take['data']
+        # Position of the chosen option per question; position 0 is correct
+        for choices in [(0, 0), (0, 1), (1, 0)]:
+            answers = [
+                {'question_id': question['id'], 'option_id': question['options'][choice]['id']}
+                for question, choice in zip((first, second), choices)
+            ]
+            score = choices.count(0)
+            Attempt.objects.create(
+                quiz=quiz, version=1, graded_version=1, score=score, total=2,
+                answer_sheet=sheets.encode(snapshot, answers)
+            )
+
+        response = self.client.get(f'/api/quizzes/{quiz.pk}/item-analysis/')
+
+        self.assertEqual(response.status_code, 200)
+        report = response.json()['data']
+        self.assertEqual(report['attempts'], 3)
+        self.assertEqual([item['difficulty'] for item in report['items']], [0.6667, 0.6667])
+        self.assertEqual([option['count'] for option in report['items'][0]['options']], [2, 1, 0])
+
+    def test_chunked_report_matches_single_pass(self):
+        quiz = make_quiz(questions=3, options=3)
+        record_choices(quiz, *[(attempt % 3, attempt % 2, (attempt // 2) % 3) for attempt in range(11)])
+        # A sheet that doesn't fit the version's layout is left out
+        Attempt.objects.create(quiz=quiz, version=1, graded_version=1, score=0, total=3, answer_sheet=b'\0' * 5)
+
+        report = analytics.analyze(quiz)
+        self.assertEqual(report['attempts'], 11)
+        for chunk_size in (1, 2, 5):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(analytics.analyze(quiz, chunk_size=chunk_size), report)
+
+
+def make_snapshot(question_count, first_option_id, options=3):
+    """In-memory snapshot with consecutive option ids; the second option is correct"""
+    questions = [
+        {
+            'id': question_id,
+            'text': 'Question',
+            'options': [
+                {'id': first_option_id + question_id * options + position, 'text': 'Option'}
+                for position in range(options)
+            ],
+        }
+        for question_id in range(1, question_count + 1)
+    ]
+    answer_key = {question['id']: question['options'][1]['id'] for question in questions}
+    return snapshots.Snapshot(1, 1, {'data': questions}, answer_key)
+
+
+class SheetsTests(SimpleTestCase):
+    def test_round_trip(self):
+        for first_option_id in (0, 2 ** 32 - 5, 2 ** 40, 2 ** 63 - 100):
+            with self.subTest(first_option_id=first_option_id):
+                snapshot = make_snapshot(4, first_option_id)
+                questions = snapshot.take['data']
+                selections = [questions[0]['options'][1]['id'], None, questions[2]['options'][0]['id'], 0]
+                answers = [
+                    {'question_id': question['id'], 'option_id': option_id}
+                    for question, option_id in zip(questions, selections) if option_id
+                ]
+
+                sheet = sheets.encode(snapshot, answers)
+                self.assertEqual(len(sheet), 4 * sheets.ITEMSIZE)
+                self.assertEqual(sheets.pack_selections(snapshot, selections), sheet)
+                self.assertEqual(list(sheets.decode(sheet)), [option_id or 0 for option_id in selections])
+                self.assertEqual(sheets.score(sheet, snapshot.key), 1)
+                # Stored little-endian whatever the platform
+                self.assertEqual(sheet[:8], selections[0].to_bytes(8, 'little'))
+
+                layout = analytics.Layout(snapshot, snapshot.answer_key)
+                self.assertEqual(layout.codes([sheet, sheet]).tolist(), [[2, 0, 1, 0]] * 2)
+
+
+    def test_pack_selections_validation(self):
+        snapshot = make_snapshot(3, 100)
+        first, second, third = (
+            [option['id'] for option in question['options']] for question in snapshot.take['data']
+        )
+        cases = [
+            ({'0': first[0]}, 'must be a list'),
+            ('1,2,3', 'must be a list'),
+            ([first[0], second[0]], 'must have 3 entries'),
+            ([first[0], second[0], third[0], None], 'must have 3 entries'),
+            ([first[0], True, third[0]], 'option id or null'),
+            ([first[0], str(second[0]), third[0]], 'option id or null'),
+            ([first[0], float(second[0]), third[0]], 'option id or null'),
+            (
+                [first[0], second[0], first[1]],
+                f'selections[2] is not an option of question {snapshot.question_ids[2]}'
+            ),
+            ([-1, second[0], third[0]], 'selections[0] is not an option'),
+        ]
+        for selections, message in cases:
+            with self.subTest(selections=selections):
+                with self.assertRaises(sheets.InvalidSelections) as raised:
+                    sheets.pack_selections(snapshot, selections)
+                self.assertIn(message, str(raised.exception))
+
+        # null and 0 both leave a question unanswered
+        self.assertEqual(
+            sheets.pack_selections(snapshot, [None, second[2], 0]),
+            sheets.encode(snapshot, [{'question_id': snapshot.question_ids[1], 'option_id': second[2]}])
+        )
+        self.assertEqual(list(sheets.decode(sheets.pack_selections(snapshot, [None, None, None]))), [0, 0, 0])
+
+
+class SubmissionFormatTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(questions=3, options=3)
+        self.url = f'/api/quizzes/{self.quiz.pk}/submit/'
+        self.questions = self.client.get(f'/api/quizzes/{self.quiz.pk}/take/').json()['data']
+
+    def submit(self, body):
+        return self.client.post(self.url, body, format='json')
+
+    def test_formats_are_equivalent(self):
+        # Correct, wrong, unanswered
+        selections = [self.questions[0]['options'][0]['id'], self.questions[1]['options'][2]['id'], None]
+        answers = [
+            {'question_id': question['id'], 'option_id': option_id}
+            for question, option_id in zip(self.questions, selections) if option_id
+        ]
+
+        by_answers = self.submit({'version': 1, 'answers': answers}).json()
+        by_selections = self.submit({'version': 1, 'selections': selections}).json()
+
+        for result in (by_answers, by_selections):
+            self.assertEqual((result['score'], result['total'], result['percentage']), (1, 3, 33.33))
+        first, second = Attempt.objects.order_by('id')
+        self.assertEqual(bytes(first.answer_sheet), bytes(second.answer_sheet))
+        self.assertEqual((first.score, first.total), (second.score, second.total))
+
+    def test_answering_twice_scores_once(self):
+        correct = {'question_id': self.questions[0]['id'], 'option_id': self.questions[0]['options'][0]['id']}
+        result = self.submit({'answers': [correct, correct, correct]}).json()
+        self.assertEqual((result['score'], result['total']), (1, 3))
+
+    def test_selections_require_integer_version(self):
+        selections = [question['options'][0]['id'] for question in self.questions]
+        for body in (
+            {'selections': selections},
+            {'version': '1', 'selections': selections},
+            {'version': 0, 'selections': selections},
+            {'version': True, 'selections': selections},
+            {'version': None, 'selections': selections},
+        ):
+            with self.subTest(body=body):
+                response = self.submit(body)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('version', response.json()['details'])
+
+        response = self.submit({'version': 1, 'selections': selections[:2]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('selections', response.json()['details'])
+        self.assertEqual(self.submit({'version': 7, 'selections': selections}).status_code, 400)
+        self.assertFalse(Attempt.objects.exists())
+
+
+class AnswerSheetMigrationTests(TransactionTestCase):
+    """Sheets packed from the former AttemptAnswer rows, and widened from uint32"""
+
+    def setUp(self):
+        reset_caches()
+        self.addCleanup(call_command, 'migrate', 'quiz', verbosity=0)
+
+    def migrate(self, target):
+        from django.db.migrations.executor import MigrationExecutor
+
+        call_command('migrate', 'quiz', target, verbosity=0)
+        return MigrationExecutor(connection).loader.project_state(('quiz', target)).apps
+
+    def add_attempt(self, apps, option_ids, big_id=2 ** 40):
+        """Quiz version 1 with two questions; option ids start at big_id"""
+        Quiz = apps.get_model('quiz', 'Quiz')
+        Question = apps.get_model('quiz', 'Question')
+        Option = apps.get_model('quiz', 'Option')
+        quiz = Quiz.objects.create(title='Migrated', version=1)
+        questions = [Question.objects.create(quiz=quiz, text=f'Question {number}') for number in range(2)]
+        options = [
+            [
+                Option.objects.create(id=big_id + 2 * index + position, question=question, text='Option')
+                for position in range(2)
+            ]
+            for index, question in enumerate(questions)
+        ]
+        data = {
+            'take': {'data': [
+                {'id': question.id, 'options': [{'id': option.id} for option in question_options]}
+                for question, question_options in zip(questions, options)
+            ]},
+            'answer_key': {
+                str(question.id): question_options[0].id for question, question_options in zip(questions, options)
+            },
+        }
+        apps.get_model('quiz', 'QuizSnapshot').objects.create(
+            quiz=quiz, version=1, data=zlib.compress(json.dumps(data).encode())
+        )
+        attempt = apps.get_model('quiz', 'Attempt').objects.create(
+            quiz=quiz, version=1, score=1, total=2, graded_version=1
+        )
+        return attempt, questions, [question_options[position] for question_options, position in zip(options, option_ids)]
+
+    def test_back_fill_from_answer_rows(self):
+        apps = self.migrate('0004_quiz_generations')
+        attempt, questions, chosen = self.add_attempt(apps, (0, 1))
+        AttemptAnswer = apps.get_model('quiz', 'AttemptAnswer')
+        for question, option in zip(questions, chosen):
+            AttemptAnswer.objects.create(attempt_id=attempt.id, question_id=question.id, option_id=option.id)
+
+        # Through 0007 too, which must not widen the sheets 0005 packed again
+        apps = self.migrate('0007_widen_answer_sheets')
+        sheet = bytes(apps.get_model('quiz', 'Attempt').objects.get(pk=attempt.id).answer_sheet)
+        self.assertEqual(len(sheet), 2 * sheets.ITEMSIZE)
+        self.assertEqual(list(sheets.decode(sheet)), [option.id for option in chosen])
+
+    def test_widen_uint32_sheets(self):
+        apps = self.migrate('0006_delete_attemptanswer')
+        attempt, _, chosen = self.add_attempt(apps, (1, 0), big_id=2 ** 31)
+        narrow = b''.join(option.id.to_bytes(4, 'little') for option in chosen)
+        Attempt = apps.get_model('quiz', 'Attempt')
+        Attempt.objects.filter(pk=attempt.id).update(answer_sheet=narrow)
+
+        apps = self.migrate('0007_widen_answer_sheets')
+        Attempt = apps.get_model('quiz', 'Attempt')
+        sheet = bytes(Attempt.objects.get(pk=attempt.id).answer_sheet)
+        self.assertEqual(list(sheets.decode(sheet)), [option.id for option in chosen])
+
+        # Reversible while every id still fits in 32 bits
+        apps = self.migrate('0006_delete_attemptanswer')
+        self.assertEqual(bytes(apps.get_model('quiz', 'Attempt').objects.get(pk=attempt.id).answer_sheet), narrow)
+
+
+def record_choices(quiz, *attempts):
+    """Store an attempt per tuple of chosen option positions, graded as submit would"""
+    snapshot = snapshots.get_snapshot(quiz)
+    records = []
+    for choices in attempts:
+        answers = [
+            {'question_id': question['id'], 'option_id': question['options'][choice]['id']}
+            for question, choice in zip(snapshot.take['data'], choices)
+        ]
+        sheet = sheets.encode(snapshot, answers)
+        records.append(grading.record_attempt(
+            quiz.pk, snapshot.version, sheet, sheets.score(sheet, snapshot.key), len(snapshot.question_ids)
+        ))
+    return records
+
+
+def move_key(question, position=1):
+    """Make another option of the question the correct one, as an edit would"""
+    question.options.update(is_correct=False)
+    question.options.filter(pk=question.options.order_by('id')[position].pk).update(is_correct=True)
+    snapshots.bump_version(question.quiz_id)
+    coherence.bump(question.quiz_id)
+
+
+class RegradeTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(questions=2, options=3)
+        self.questions = list(self.quiz.questions.order_by('id'))
+
+    def scores(self):
+        return list(Attempt.objects.filter(quiz=self.quiz).order_by('id').values_list('score', 'graded_version'))
+
+    def test_regrade_against_changed_key(self):
+        record_choices(self.quiz, (0, 0), (1, 0), (2, 2))
+        move_key(self.questions[0])
+
+        quiz = Quiz.objects.get(pk=self.quiz.pk)
+        self.assertEqual(grading.regrade_quiz(quiz), 3)
+        self.assertEqual(self.scores(), [(1, 2), (2, 2), (0, 2)])
+        self.assertEqual(grading.regrade_quiz(quiz), 0)
+
+    def test_deleted_question_keeps_its_key(self):
+        record_choices(self.quiz, (0, 0), (0, 1))
+        self.questions[1].delete()
+        snapshots.bump_version(self.quiz.pk)
+        coherence.bump(self.quiz.pk)
+
+        self.assertEqual(grading.regrade_quiz(Quiz.objects.get(pk=self.quiz.pk)), 2)
+        self.assertEqual(self.scores(), [(2, 2), (1, 2)])
+        self.assertEqual(list(Attempt.objects.values_list('total', flat=True)), [2, 2])
+
+    def test_regrade_range_then_resume(self):
+        attempts = record_choices(self.quiz, (0, 0), (1, 0), (1, 1), (0, 1))
+        move_key(self.questions[0])
+        quiz = Quiz.objects.get(pk=self.quiz.pk)
+        answered = snapshots.get_snapshot(quiz, 1)
+        keys = {1: sheets.key_vector(answered.question_ids, snapshots.get_snapshot(quiz).answer_key)}
+
+        chunks = []
+        regraded = grading.regrade_range(
+            quiz.pk, quiz.version, keys, attempts[0].id, attempts[1].id, chunk_size=1, progress=chunks.append
+        )
+        self.assertEqual((regraded, chunks), (2, [1, 1]))
+        # As if interrupted here: the rest is still graded against version 1
+        self.assertEqual(self.scores(), [(1, 2), (2, 2), (0, 1), (1, 1)])
+
+        # Re-running resumes with the attempts still behind
+        self.assertEqual(grading.regrade_quiz(quiz), 2)
+        self.assertEqual(self.scores(), [(1, 2), (2, 2), (1, 2), (0, 2)])
+
+    def test_version_without_snapshot_stays_pending(self):
+        Attempt.objects.create(quiz=self.quiz, version=1, graded_version=1, score=0, total=2)
+        move_key(self.questions[0])
+        QuizSnapshot.objects.filter(quiz=self.quiz).delete()
+        reset_caches()
+
+        self.assertEqual(grading.regrade_quiz(Quiz.objects.get(pk=self.quiz.pk)), 0)
+        self.assertEqual(self.scores(), [(0, 1)])
+
+
+class DeleteQuizTests(QuizTestCase):
+    """delete_quiz() relies on QuerySet._raw_delete(); these pin what it does"""
+
+    def test_deletes_quiz_and_dependents_only(self):
+        quiz = make_quiz(questions=3, options=4)
+        other = make_quiz('Rivers', questions=2, options=2)
+        for target in (quiz, other):
+            snapshots.get_snapshot(target)
+            Attempt.objects.bulk_create([
+                Attempt(quiz=target, version=1, graded_version=1, score=1, total=2)
+                for _ in range(5)
+            ])
+
+        # One DELETE per table, inside a savepoint here
+        with self.assertNumQueries(8):
+            deleted = bulk.delete_quiz(quiz.pk)
+
+        # 12 options, 3 questions, 5 attempts, snapshot, generation, quiz
+        self.assertEqual(deleted, 12 + 3 + 5 + 1 + 1 + 1)
+        for model, field in [
+            (Option, 'question__quiz'), (Question, 'quiz'), (Attempt, 'quiz'),
+            (QuizSnapshot, 'quiz'), (QuizGeneration, 'quiz'), (Quiz, 'pk'),
+        ]:
+            with self.subTest(model=model.__name__):
+                self.assertFalse(model.objects.filter(**{field: quiz.pk}).exists())
+                self.assertTrue(model.objects.filter(**{field: other.pk}).exists())
+
+        self.assertEqual(Option.objects.count(), 4)
+        self.assertEqual(Attempt.objects.count(), 5)
+
+
+class QuestionUpdateTests(QuizTestCase):
+    """Question edits apply the options list as a diff by id"""
+
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(questions=2, options=3)
+        self.question, self.other = self.quiz.questions.order_by('id')
+        self.options = list(self.question.options.order_by('id'))
+        self.url = f'/api/questions/{self.question.pk}/'
+
+    def body(self, options):
+        return {'quiz': self.quiz.pk, 'text': self.question.text, 'options': options}
+
+    def listed(self, option, **changes):
+        return {'id': option.pk, 'text': option.text, 'is_correct': option.is_correct, **changes}
+
+    def current(self):
+        return list(self.question.options.order_by('id').values_list('id', 'text', 'is_correct'))
+
+    def test_diff_keeps_ids_of_edited_options(self):
+        first, second, third = self.options
+        response = self.client.put(self.url, self.body([
+            self.listed(first, is_correct=False),
+            self.listed(second, text='Edited', is_correct=True),
+            {'text': 'Added', 'is_correct': False},
+        ]), format='json')
+
+        self.assertEqual(response.status_code, 200)
+        current = self.current()
+        self.assertEqual(current[:2], [(first.pk, 'Option 0', False), (second.pk, 'Edited', True)])
+        self.assertEqual([(text, is_correct) for _, text, is_correct in current[2:]], [('Added', False)])
+        self.assertNotIn(third.pk, [option_id for option_id, _, _ in current])
+        self.assertEqual(Quiz.objects.get(pk=self.quiz.pk).version, 2)
+
+    def test_write_queries(self):
+        from .serializers import QuestionCreateSerializer
+
+        first, second, third = self.options
+        serializer = QuestionCreateSerializer(self.question, data=self.body([
+            self.listed(first),
+            self.listed(second, text='Edited'),
+            {'text': 'Added', 'is_correct': False},
+        ]))
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        # Question UPDATE, one DELETE, one bulk UPDATE and one INSERT; the
+        # unchanged option is not written
+        with self.assertNumQueries(4):
+            serializer.save()
+        self.assertEqual(len(self.current()), 3)
+
+    def test_patch_without_options_leaves_them(self):
+        before = self.current()
+        response = self.client.patch(self.url, {'text': 'Renamed question'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Question.objects.get(pk=self.question.pk).text, 'Renamed question')
+        self.assertEqual(self.current(), before)
+
+    def test_rejected_option_ids(self):
+        first, second, _ = self.options
+        foreign = self.other.options.order_by('id')[0]
+        cases = [
+            ([self.listed(first), self.listed(foreign, text='Foreign', is_correct=False)], 'do not belong'),
+            ([self.listed(first), self.listed(first, text='Again', is_correct=False)], 'only be listed once'),
+            ([self.listed(first), {'id': 10 ** 9, 'text': 'Unknown', 'is_correct': False}], 'do not belong'),
+        ]
+        before = self.current()
+        for options, message in cases:
+            with self.subTest(message=message):
+                response = self.client.put(self.url, self.body(options), format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(message, str(response.json()['details']['options']))
+
+        self.assertEqual(self.current(), before)
+        self.assertTrue(Option.objects.filter(pk=foreign.pk, question=self.other).exists())
+        self.assertEqual(Quiz.objects.get(pk=self.quiz.pk).version, 1)
+
+
+class AdminQueryCountTests(QuizTestCase):
+    """Admin pages must not issue queries per listed row"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def add_quizzes(self, count):
+        for _ in range(count):
+            quiz = make_quiz(f'Quiz {Quiz.objects.count()}', questions=3, options=4)
+            Attempt.objects.create(quiz=quiz, version=1, graded_version=1, score=2, total=3)
+
+    def assert_page_queries(self, url, count):
+        with self.assertNumQueries(count):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_changelists_independent_of_row_count(self):
+        # Session, user, page of rows, filtered count
+        urls = ['/admin/quiz/quiz/', '/admin/quiz/question/', '/admin/quiz/option/']
+        for total in (2, 20):
+            self.add_quizzes(total - Quiz.objects.count())
+            for url in urls:
+                with self.subTest(url=url, quizzes=total):
+                    self.assert_page_queries(url, 4)
+
+    def test_question_change_form_with_options_inline(self):
+        self.add_quizzes(1)
+        question = Question.objects.first()
+        self.assert_page_queries(f'/admin/quiz/question/{question.pk}/change/', 6)
+
+    def test_quiz_delete_confirmation_counts(self):
+        self.add_quizzes(1)
+        quiz = Quiz.objects.get()
+        # The overridden get_deleted_objects counts instead of collecting rows
+        self.assert_page_queries(f'/admin/quiz/quiz/{quiz.pk}/delete/', 6)
+        response = self.client.get(f'/admin/quiz/quiz/{quiz.pk}/delete/')
+        self.assertEqual(
+            dict(response.context['model_count']),
+            {'Quizzes': 1, 'questions': 3, 'options': 12, 'attempts': 1}
+        )
+
+
+def make_registry(directory=None, flush_interval=0.0):
+    registry = metrics.Registry(directory, flush_interval)
+    requests = registry.counter('test_requests_total', 'Requests.', ['action'])
+    latency = registry.histogram('test_latency_seconds', 'Latency.', buckets=(1, 5))
+    return registry, requests, latency
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_render(self):
+        registry, requests, latency = make_registry()
+        requests.inc(action='take')
+        requests.inc(2, action='submit')
+        for amount in (0.5, 3, 7):
+            latency.observe(amount)
+
+        self.assertEqual(registry.render(), '\n'.join([
+            '# HELP test_requests_total Requests.',
+            '# TYPE test_requests_total counter',
+            'test_requests_total{action="submit"} 2',
+            'test_requests_total{action="take"} 1',
+            '# HELP test_latency_seconds Latency.',
+            '# TYPE test_latency_seconds histogram',
+            'test_latency_seconds_bucket{le="1"} 1',
+            'test_latency_seconds_bucket{le="5"} 2',
+            'test_latency_seconds_bucket{le="+Inf"} 3',
+            'test_latency_seconds_sum 10.5',
+            'test_latency_seconds_count 3',
+        ]) + '\n')
+
+    def test_processes_share_directory(self):
+        # Two workers' registries writing their own files to one directory
+        first, first_requests, first_latency = make_registry(self.directory, flush_interval=3600)
+        second, second_requests, second_latency = make_registry(self.directory)
+        first_requests.inc(action='take')
+        first_requests.inc(action='take')
+        first_latency.observe(0.5)
+        second_requests.inc(3, action='take')
+        second_requests.inc(action='submit')
+        second_latency.observe(2)
+        second_latency.observe(9)
+        # Half-written or foreign files are skipped
+        with open(os.path.join(self.directory, 'quiz_metrics_0_broken.json'), 'w') as file:
+            file.write('{"test_requests_total": [[')
+
+        # The first registry only flushed its first update before throttling
+        self.assertEqual(second.collect(), {
+            'test_requests_total': {('take',): 4, ('submit',): 1},
+            'test_latency_seconds': {(): [0, 1, 11, 2]},
+        })
+        # Collecting flushes the scraping process's own values
+        self.assertEqual(first.collect(), {
+            'test_requests_total': {('take',): 5, ('submit',): 1},
+            'test_latency_seconds': {(): [1, 1, 11.5, 3]},
+        })
+        self.assertIn('test_latency_seconds_bucket{le="5"} 2', first.render())
+
+    def test_forked_child_starts_over(self):
+        registry, requests, _ = make_registry(self.directory)
+        requests.inc(action='take')
+        parent_file = registry._filename
+
+        with mock.patch.object(os, 'getpid', return_value=registry._pid + 1):
+            requests.inc(action='take')
+            self.assertNotEqual(registry._filename, parent_file)
+            self.assertEqual(registry._values, {'test_requests_total': {('take',): 1}})
+            # The parent's file is counted once, next to the child's own
+            self.assertEqual(registry.collect(), {'test_requests_total': {('take',): 2}})
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+
+class MetricsEndpointTests(QuizTestCase):
+    def test_exposition_format(self):
+        quiz = make_quiz()
+        self.client.get(f'/api/quizzes/{quiz.pk}/take/')
+
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        lines = response.content.decode().splitlines()
+        self.assertIn('# TYPE quiz_requests_total counter', lines)
+        self.assertIn('# TYPE quiz_request_duration_seconds histogram', lines)
+        self.assertTrue(any(line.startswith('quiz_requests_total{action="quiz_take",status="200"} ') for line in lines))
+        self.assertTrue(any(
+            line.startswith('quiz_request_duration_seconds_bucket{action="quiz_take",le="+Inf"} ') for line in lines
+        ))
+        for line in lines:
+            if not line.startswith('#'):
+                float(line.rsplit(' ', 1)[1])
+        self.assertEqual(self.client.post('/metrics').status_code, 405)
+
+
+class LiveResultsTests(QuizTestCase):
+    def test_load_matches_incremental_updates(self):
+        quiz = make_quiz()
+        scores = [(3, 4), (4, 4), (0, 4), (1, 3), (2, 3), (0, 0), (9, 10), (5, 10), (1, 1), (2, 5)]
+        attempts = Attempt.objects.bulk_create([
+            Attempt(quiz=quiz, version=1, graded_version=1, score=score, total=total)
+            for score, total in scores
+        ])
+        rows = [(attempt.pk, attempt.score, attempt.total) for attempt in attempts]
+
+        expected = live.QuizBroadcaster(quiz.pk, top_n=4)
+        for row in rows:
+            expected._apply(*row)
+
+        loaded = live.QuizBroadcaster(quiz.pk, top_n=4)
+        # Published while loading: one already in the rows, one not yet
+        loaded.publish(*rows[-1])
+        loaded.publish(rows[-1][0] + 1, 7, 7)
+        expected._apply(rows[-1][0] + 1, 7, 7)
+        with self.assertNumQueries(3):
+            loaded._load()
+
+        self.assertEqual(loaded._submissions, expected._submissions)
+        self.assertEqual(loaded._distribution, expected._distribution)
+        self.assertEqual(loaded._top, expected._top)
+
+    def test_stream_requires_authentication(self):
+        from django.test import Client
+        from rest_framework.authtoken.models import Token
+
+        quiz = make_quiz()
+        url = f'/api/quizzes/{quiz.pk}/live/'
+        token = Token.objects.create(user=self.admin)
+        session = Client()
+        session.force_login(self.admin)
+
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Token not-a-token'}):
+            with self.subTest(headers=headers):
+                response = Client().get(url, **headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+        # Past authentication, a missing quiz is still a 404 and a slow
+        # load a 503 rather than a stream
+        with mock.patch.object(live, 'subscribe', side_effect=singleflight.Timeout):
+            self.assertEqual(Client().get(url, HTTP_AUTHORIZATION=f'Token {token.key}').status_code, 503)
+            self.assertEqual(session.get(url).status_code, 503)
+        self.assertEqual(session.get('/api/quizzes/0/live/').status_code, 404)
+
+    def test_timed_out_subscriber_stops_broadcaster(self):
+        release = threading.Event()
+
+        async def scenario():
+            with self.assertRaises(singleflight.Timeout):
+                await live.subscribe(1)
+            self.assertNotIn(1, live._broadcasters)
+
+            # The load finishes after everyone gave up; nothing may keep running
+            release.set()
+            while singleflight.loads._tasks:
+                await asyncio.sleep(0.01)
+            return asyncio.all_tasks() - {asyncio.current_task()}
+
+        with mock.patch.object(live.QuizBroadcaster, '_load', lambda broadcaster: release.wait(5)), \
+                mock.patch.object(singleflight.loads, 'timeout', 0.05):
+            self.assertEqual(asyncio.run(scenario()), set())
+
+
+def burst(count, func):
+    """Call func() from `count` threads released at once; (results, errors)"""
+    barrier = threading.Barrier(count)
+    results, errors = [None] * count, [None] * count
+
+    def run(index):
+        try:
+            barrier.wait()
+            results[index] = func()
+        except Exception as e:
+            errors[index] = e
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_calls_share_one_run(self):
+        group = singleflight.Group(timeout=5)
+        calls = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.2)
+            return object()
+
+        results, errors = burst(20, lambda: group.do('key', load))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(errors, [None] * 20)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(group.do('key', lambda: 'again'), 'again')
+
+    def test_leader_error_reaches_every_waiter(self):
+        group = singleflight.Group(timeout=5)
+        error = ValueError('load failed')
+
+        def load():
+            time.sleep(0.2)
+            raise error
+
+        _, errors = burst(10, lambda: group.do('key', load))
+
+        self.assertTrue(all(raised is error for raised in errors))
+        self.assertEqual(group._calls, {})
+
+    def test_waiter_times_out(self):
+        group = singleflight.Group(timeout=0.05)
+        results, errors = burst(5, lambda: group.do('key', lambda: time.sleep(0.3) or 'loaded'))
+
+        self.assertEqual(results.count('loaded'), 1)
+        self.assertEqual(sum(isinstance(error, singleflight.Timeout) for error in errors), 4)
+
+    def test_payload_burst_builds_once(self):
+        cache.clear()
+        builds = []
+
+        def builder():
+            builds.append(1)
+            time.sleep(0.2)
+            return {'message': 'ok', 'data': [1, 2, 3]}
+
+        results, errors = burst(
+            20, lambda: payload_cache.get_variants(payload_cache.TAKE, 1, 1, builder)
+        )
+
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(errors, [None] * 20)
+        self.assertTrue(all(result == results[0] for result in results))
+
+    def test_async_calls_share_one_task(self):
+        group = singleflight.Group(timeout=5)
+        calls = []
+        error = KeyError('missing')
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return 'loaded'
+
+        async def fail():
+            await asyncio.sleep(0.1)
+            raise error
+
+        async def scenario():
+            results = await asyncio.gather(*[group.ado('load', load) for _ in range(50)])
+            self.assertEqual(results, ['loaded'] * 50)
+            self.assertEqual(len(calls), 1)
+
+            raised = await asyncio.gather(*[group.ado('fail', fail) for _ in range(5)], return_exceptions=True)
+            self.assertTrue(all(exception is error for exception in raised))
+
+            # A waiter that gives up, or is cancelled, leaves the load running for the rest
+            calls.clear()
+            cancelled = asyncio.ensure_future(group.ado('shared', load))
+            waiting = asyncio.ensure_future(group.ado('shared', load))
+            with self.assertRaises(singleflight.Timeout):
+                await group.ado('shared', load, timeout=0.01)
+            cancelled.cancel()
+            self.assertEqual(await waiting, 'loaded')
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(group._tasks, {})
+
+        asyncio.run(scenario())
+
+
+class ColdLoadTests(TransactionTestCase):
+    """A burst of requests for a quiz nothing has cached yet"""
+
+    def setUp(self):
+        reset_caches()
+        self.addCleanup(reset_caches)
+        self.quiz = make_quiz(questions=10)
+
+    def test_snapshot_burst_builds_once(self):
+        builds = []
+        questions_queries = []
+        build = snapshots._build
+
+        def slow_build(quiz):
+            builds.append(quiz.pk)
+            time.sleep(0.2)
+            return build(quiz)
+
+        def count_questions(execute, sql, params, many, context):
+            if 'FROM "quiz_question"' in sql:
+                questions_queries.append(sql)
+            return execute(sql, params, many, context)
+
+        def get_snapshot():
+            with connection.execute_wrapper(count_questions):
+                return snapshots.get_snapshot(Quiz(pk=self.quiz.pk, title=self.quiz.title, version=1))
+
+        with mock.patch.object(snapshots, '_build', slow_build):
+            results, errors = burst(20, get_snapshot)
+
+        self.assertEqual(errors, [None] * 20)
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(len(questions_queries), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(len(results[0].question_ids), 10)
+
+
+class LoadTimeoutTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz()
+
+    def test_take_answers_503_while_load_is_slow(self):
+        key = payload_cache.payload_key(payload_cache.TAKE, self.quiz.pk, self.quiz.version)
+        started, release = threading.Event(), threading.Event()
+
+        def stuck_load():
+            started.set()
+            release.wait(5)
+
+        # Another request's build of the same payload, still running
+        leader = threading.Thread(target=singleflight.loads.do, args=(('payload', key), stuck_load))
+        leader.start()
+        self.addCleanup(leader.join)
+        self.addCleanup(release.set)
+        started.wait(5)
+
+        with mock.patch.object(singleflight.loads, 'timeout', 0.05):
+            response = self.client.get(f'/api/quizzes/{self.quiz.pk}/take/')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(views.LOAD_RETRY_AFTER))
+
+
+def _use_database(path):
+    """In a forked worker: move the default connection to another SQLite file"""
+    connection.settings_dict['NAME'] = path
+    connection.close()
+    reset_caches()
+
+
+def _create_database(path, results):
+    _use_database(path)
+    call_command('migrate', verbosity=0)
+    User.objects.create(username='admin', is_staff=True, is_superuser=True)
+    results.put(make_quiz().pk)
+
+
+def _rename_quiz(path, quiz_id, results):
+    _use_database(path)
+    client = APIClient()
+    client.force_authenticate(User.objects.get(username='admin'))
+    response = client.patch(f'/api/quizzes/{quiz_id}/', {'title': 'Renamed elsewhere'}, format='json')
+    results.put(response.status_code)
+
+
+def _take_around_edit(path, quiz_id, interval, edited, results):
+    _use_database(path)
+    coherence.quizzes.interval = interval
+    client = APIClient()
+    url = f'/api/quizzes/{quiz_id}/take/'
+
+    take = client.get(url).json()
+    results.put((coherence.quizzes.get(quiz_id) is not None, take['version'], take['quiz_title']))
+
+    edited.wait(30)
+    time.sleep(interval * 1.5)
+    dropped = coherence.quizzes.get(quiz_id) is None
+    take = client.get(url).json()
+    results.put((dropped, take['version'], take['quiz_title']))
+
+
+def _regrade_with_workers(path, results):
+    _use_database(path)
+    call_command('migrate', verbosity=0)
+    quiz = make_quiz(questions=3)
+    record_choices(quiz, *[(attempt % 3, 0, attempt % 2) for attempt in range(40)])
+    move_key(quiz.questions.order_by('id')[0])
+
+    output = io.StringIO()
+    call_command('regrade', quiz.pk, workers=2, chunk_size=3, stdout=output)
+    results.put((
+        output.getvalue(),
+        list(Attempt.objects.order_by('id').values_list('score', 'graded_version'))
+    ))
+
+
+@unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'needs fork()')
+class ForkedWorkersTestCase(TransactionTestCase):
+    """Worker processes sharing one SQLite database file"""
+
+    def setUp(self):
+        self.context = multiprocessing.get_context('fork')
+        self.results = self.context.Queue()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+
+    def run_worker(self, target, *args):
+        worker = self.context.Process(target=target, args=(self.path, *args, self.results))
+        worker.start()
+        return worker
+
+    def finish(self, worker):
+        worker.join(30)
+        self.assertEqual(worker.exitcode, 0)
+
+
+class RegradeWorkersTests(ForkedWorkersTestCase):
+    # The pool's workers must inherit the temporary database, not re-read settings
+    @unittest.skipUnless(multiprocessing.get_start_method() == 'fork', 'pool workers need fork()')
+    def test_regrade_command_with_workers(self):
+        worker = self.run_worker(_regrade_with_workers)
+        output, scores = self.results.get(timeout=60)
+        self.finish(worker)
+
+        self.assertIn('Regrading 40 attempts', output)
+        self.assertIn('Regraded 40 attempts.', output)
+        self.assertIn('40/40 (100%)', output)
+        expected = [((attempt % 3 == 1) + 1 + (attempt % 2 == 0), 2) for attempt in range(40)]
+        self.assertEqual(scores, expected)
+
+
+class CrossProcessCoherenceTests(ForkedWorkersTestCase):
+    """Two worker processes sharing one database"""
+
+    interval = 0.3
+
+    def test_edit_reaches_other_worker_within_interval(self):
+        self.finish(self.run_worker(_create_database))
+        quiz_id = self.results.get(timeout=30)
+
+        edited = self.context.Event()
+        reader = self.run_worker(_take_around_edit, quiz_id, self.interval, edited)
+        cached, version, title = self.results.get(timeout=30)
+        self.assertTrue(cached)
+        self.assertEqual((version, title), (1, 'Capitals'))
+
+        self.finish(self.run_worker(_rename_quiz, quiz_id))
+        self.assertEqual(self.results.get(timeout=30), 200)
+        edited.set()
+
+        dropped, version, title = self.results.get(timeout=30)
+        self.finish(reader)
+        self.assertTrue(dropped)
+        self.assertEqual((version, title), (2, 'Renamed elsewhere'))
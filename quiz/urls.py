@@ -1,8 +1,8 @@
 from django.contrib import admin
 from django.urls import path,include
-from .views import register_view, login_view, logout_view
+from .views import register_view, login_view, logout_view, metrics_view
 from rest_framework.routers import DefaultRouter
-from .views import QuizViewSet, QuestionViewSet
+from .views import QuizViewSet, QuestionViewSet, live_view
 
 router = DefaultRouter()
 router.register(r'quizzes', QuizViewSet, basename='quiz')
@@ -12,5 +12,7 @@ urlpatterns  = [
     path('api/auth/register/', register_view, name='register'),  # Add this
     path('api/auth/login/', login_view, name='login'),
     path('api/auth/logout/', logout_view, name='logout'),
+    path('api/quizzes/<int:pk>/live/', live_view, name='quiz-live'),
     path('api/', include(router.urls)),  # Include the router URLs
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
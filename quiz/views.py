@@ -1,15 +1,32 @@
+import time
+
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from .serializers import AdminRegistrationSerializer  # Add this import
+from . import metrics
+from . import passwords
+
+
+def _saturated_response(retry_after=passwords.RETRY_AFTER):
+    """Fast rejection while a bounded resource (hashing pool, cold load) is busy"""
+    response = Response(
+        {'error': 'Server is busy, please try again shortly'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
 
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@metrics.instrument('register')
 def register_view(request):
     """
     Admin registration endpoint
@@ -17,7 +34,10 @@ def register_view(request):
     serializer = AdminRegistrationSerializer(data=request.data)
     
     if serializer.is_valid():
-        user = serializer.save()
+        try:
+            user = serializer.save()
+        except passwords.Saturated:
+            return _saturated_response()
         
         # Create token for the new user
         token = Token.objects.create(user=user)
@@ -39,6 +59,7 @@ def register_view(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@metrics.instrument('login')
 def login_view(request):
     """
     Admin login endpoint
@@ -52,7 +73,20 @@ def login_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    user = authenticate(username=username, password=password)
+    # Password hashing runs on the bounded hashing pool
+    try:
+        user = User.objects.get_by_natural_key(username)
+    except User.DoesNotExist:
+        user = None
+    
+    try:
+        if user is None:
+            # Hash anyway so unknown usernames cost as much as wrong passwords
+            passwords.make_password(password)
+        elif not (user.is_active and passwords.verify_password(user, password)):
+            user = None
+    except passwords.Saturated:
+        return _saturated_response()
     
     if not user:
         return Response(
@@ -80,6 +114,7 @@ def login_view(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@metrics.instrument('logout')
 def logout_view(request):
     """
     Admin logout endpoint
@@ -97,17 +132,104 @@ def logout_view(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus metrics endpoint
+    """
+    return HttpResponse(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
-from .models import Quiz, Question, Option
+from django.db import transaction
+from .models import Quiz, Question
+from . import analytics
+from . import bulk
+from . import cache as payload_cache
+from . import coherence
+from . import grading
+from . import idempotency
+from . import live
+from . import sheets
+from . import singleflight
+from . import snapshots
 from .serializers import (
     QuizSerializer, QuestionDetailSerializer, QuestionCreateSerializer,QuizDetailSerializer,
-    QuizTakeSerializer, AnswerSubmissionSerializer
+    AnswerSubmissionSerializer
 )
 
 
+# Seconds to wait after a timed-out cold load, which by then is usually cached
+LOAD_RETRY_AFTER = 1
+
+
+def _version_unavailable(version):
+    return Response(
+        {
+            'error': f'Quiz version {version} is not available'
+        },
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
+
+def _authenticated_user(request):
+    """
+    The user the API's authentication classes (token or session) find for
+    a plain Django request, or None
+    """
+    drf_request = Request(
+        request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    try:
+        user = drf_request.user
+    except AuthenticationFailed:
+        return None
+    return user if user.is_authenticated else None
+
+
+@require_GET
+async def live_view(request, pk):
+    """
+    Server-Sent Events stream of a quiz's live results (serve over ASGI) - Admin
+    """
+    if await sync_to_async(_authenticated_user)(request) is None:
+        response = JsonResponse(
+            {'error': 'Authentication credentials were not provided or are invalid'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+        response['WWW-Authenticate'] = 'Token'
+        return response
+    
+    if not await Quiz.objects.filter(pk=pk).aexists():
+        return JsonResponse({'error': 'Quiz not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        broadcaster, queue = await live.subscribe(pk)
+    except singleflight.Timeout:
+        response = JsonResponse(
+            {'error': 'Server is busy, please try again shortly'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+        response['Retry-After'] = str(LOAD_RETRY_AFTER)
+        return response
+    
+    response = StreamingHttpResponse(
+        live.stream(broadcaster, queue),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 class QuizViewSet(viewsets.ModelViewSet):
     queryset = Quiz.objects.all()
     serializer_class = QuizSerializer
@@ -117,7 +239,7 @@ class QuizViewSet(viewsets.ModelViewSet):
         """
         Set permissions based on action
         """
-        if self.action in ['create', 'update', 'partial_update', 'destroy','retrieve']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy','retrieve', 'regrade', 'clone', 'item_analysis']:
             return [IsAuthenticated()]
         elif self.action in ['take', 'submit']:
             return [AllowAny()] 
@@ -187,6 +309,87 @@ class QuizViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
     
+    @transaction.atomic
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        coherence.create(serializer.instance.pk)
+    
+    @transaction.atomic
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        snapshots.bump_version(serializer.instance.pk)
+        coherence.bump(serializer.instance.pk)
+        serializer.instance.refresh_from_db(fields=['version'])
+    
+    def perform_destroy(self, instance):
+        quiz_id, version = instance.pk, instance.version
+        bulk.delete_quiz(quiz_id)
+        # Free this worker's entries of the quiz now rather than letting them expire
+        payload_cache.purge(quiz_id, version)
+        snapshots.forget(quiz_id)
+    
+    def _get_quiz(self):
+        """
+        The requested quiz, served from this worker's generation-checked
+        cache when possible so hot reads skip the quiz row query.
+        """
+        try:
+            quiz_id = int(self.kwargs['pk'])
+        except ValueError:
+            return self.get_object()
+        
+        quiz = coherence.quizzes.get(quiz_id)
+        if quiz is not None:
+            return quiz
+        
+        # Read the generation before the quiz, so a write landing in between
+        # leaves the entry looking stale rather than current
+        generation = coherence.current_generation(quiz_id)
+        quiz = self.get_object()
+        
+        if generation is None:
+            coherence.ensure_generation(quiz_id)
+        else:
+            coherence.quizzes.set(quiz_id, generation, quiz)
+        
+        return quiz
+    
+    def _take_payload(self, quiz):
+        """Take payload of the current version, or None if it has no questions"""
+        return snapshots.get_snapshot(quiz).take
+    
+    def _detail_payload(self, quiz):
+        """Build the retrieve payload with questions and options prefetched"""
+        # Fresh instance: the one passed in may be shared through the quiz cache
+        quiz = Quiz.objects.prefetch_related('questions__options').get(pk=quiz.pk)
+        serializer = QuizDetailSerializer(quiz)
+        return {
+            'message': 'Quiz retrieved successfully',
+            'data': serializer.data
+        }
+    
+    def _payload_response(self, kind, quiz, builder):
+        """
+        Serve a payload from the rendered payload cache.
+        
+        JSON clients get the pre-compressed variant matching their
+        Accept-Encoding; other renderers (e.g. the browsable API) get a
+        regular Response built from fresh data. Returns None when the
+        builder has nothing to serve.
+        """
+        if self.request.accepted_renderer.format != 'json':
+            data = builder(quiz)
+            return None if data is None else Response(data, status=status.HTTP_200_OK)
+        
+        variants = payload_cache.get_variants(
+            kind, quiz.pk, quiz.version, lambda: builder(quiz)
+        )
+        if variants is None:
+            return None
+        
+        return payload_cache.variant_response(self.request, variants)
+    
+    @metrics.instrument('quiz_list')
     def list(self, request, *args, **kwargs):
         """
         List all quizzes
@@ -212,19 +415,15 @@ class QuizViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
     
+    @metrics.instrument('quiz_retrieve')
     def retrieve(self, request, *args, **kwargs):
         """
         Retrieve single quiz with details
         """
         try:
-            instance = self.get_object()
-            serializer = QuizDetailSerializer(instance)
-            return Response(
-                {
-                    'message': 'Quiz retrieved successfully',
-                    'data': serializer.data
-                },
-                status=status.HTTP_200_OK
+            instance = self._get_quiz()
+            return self._payload_response(
+                payload_cache.DETAIL, instance, self._detail_payload
             )
         except Quiz.DoesNotExist:
             return Response(
@@ -233,15 +432,20 @@ class QuizViewSet(viewsets.ModelViewSet):
                 },
                 status=status.HTTP_404_NOT_FOUND
             )
+        except singleflight.Timeout:
+            return _saturated_response(LOAD_RETRY_AFTER)
     
     @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    @metrics.instrument('quiz_take')
     def take(self, request, pk=None):
         """Endpoint to fetch quiz questions without correct answers - Public"""
         try:
-            quiz = self.get_object()
-            questions = quiz.questions.all()
+            quiz = self._get_quiz()
+            response = self._payload_response(
+                payload_cache.TAKE, quiz, self._take_payload
+            )
             
-            if not questions.exists():
+            if response is None:
                 return Response(
                     {
                         'error': 'This quiz has no questions yet'
@@ -249,16 +453,7 @@ class QuizViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            serializer = QuizTakeSerializer(questions, many=True)
-            return Response(
-                {
-                    'message': 'Quiz questions retrieved successfully',
-                    'quiz_title': quiz.title,
-                    'total_questions': questions.count(),
-                    'data': serializer.data
-                },
-                status=status.HTTP_200_OK
-            )
+            return response
         except Quiz.DoesNotExist:
             return Response(
                 {
@@ -266,44 +461,53 @@ class QuizViewSet(viewsets.ModelViewSet):
                 },
                 status=status.HTTP_404_NOT_FOUND
             )
+        except singleflight.Timeout:
+            return _saturated_response(LOAD_RETRY_AFTER)
     
     @action(detail=True, methods=['post'], permission_classes=[AllowAny])
+    @metrics.instrument('quiz_submit')
     def submit(self, request, pk=None):
         """Endpoint to submit answers and get score - Public"""
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if not idempotency_key:
+            return self._submit(request)
+        
+        if len(idempotency_key) > idempotency.MAX_KEY_LENGTH:
+            return Response(
+                {
+                    'error': f'Idempotency-Key cannot exceed {idempotency.MAX_KEY_LENGTH} characters'
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Retries are answered from the stored response, without validating
+        # or scoring the answers again
+        return idempotency.submissions.run(
+            (pk, idempotency_key),
+            idempotency.fingerprint(request.data),
+            lambda: self._submit(request)
+        )
+    
+    def _submit(self, request):
+        """Validate, score and store a submission"""
         try:
             quiz = self.get_object()
+            if isinstance(request.data, dict) and 'selections' in request.data:
+                return self._submit_selections(quiz, request.data)
+            
             serializer = AnswerSubmissionSerializer(data=request.data)
             
             if serializer.is_valid():
                 answers = serializer.validated_data['answers']
-                score = 0
-                total = len(answers)
-                
-                if total == 0:
-                    return Response(
-                        {
-                            'error': 'No answers provided'
-                        },
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+                version = serializer.validated_data.get('version', quiz.version)
                 
-                for answer in answers:
-                    question_id = answer.get('question_id')
-                    option_id = answer.get('option_id')
-                    
-                    try:
-                        option = Option.objects.get(id=option_id, question_id=question_id)
-                        if option.is_correct:
-                            score += 1
-                    except Option.DoesNotExist:
-                        pass
+                # Score against the version the answers were given for, so
+                # edits made while the quiz was being taken don't change it
+                snapshot = snapshots.get_snapshot(quiz, version)
+                if snapshot is None:
+                    return _version_unavailable(version)
                 
-                return Response({
-                    'message': 'Quiz submitted successfully',
-                    'score': score,
-                    'total': total,
-                    'percentage': round((score / total) * 100, 2)
-                })
+                return self._record_submission(quiz, snapshot, sheets.encode(snapshot, answers))
             
             return Response(
                 {
@@ -319,6 +523,170 @@ class QuizViewSet(viewsets.ModelViewSet):
                 },
                 status=status.HTTP_404_NOT_FOUND
             )
+        except singleflight.Timeout:
+            return _saturated_response(LOAD_RETRY_AFTER)
+    
+    def _submit_selections(self, quiz, data):
+        """
+        Positional submission: {"version": N, "selections": [option_id, ...]}
+        with one option id (or null) per question in take order
+        """
+        version = data.get('version')
+        if type(version) is not int or version < 1:
+            return Response(
+                {
+                    'error': 'Validation failed',
+                    'details': {'version': ['A quiz version is required with selections.']}
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        snapshot = snapshots.get_snapshot(quiz, version)
+        if snapshot is None:
+            return _version_unavailable(version)
+        
+        try:
+            sheet = sheets.pack_selections(snapshot, data['selections'])
+        except sheets.InvalidSelections as e:
+            return Response(
+                {
+                    'error': 'Validation failed',
+                    'details': {'selections': [str(e)]}
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return self._record_submission(quiz, snapshot, sheet)
+    
+    def _record_submission(self, quiz, snapshot, sheet):
+        """
+        Score, store and answer with a packed submission. Both formats
+        score out of every question of the version, answered or not.
+        """
+        total = len(snapshot.question_ids)
+        if total == 0:
+            return Response(
+                {
+                    'error': 'No answers provided'
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        started = time.perf_counter()
+        score = sheets.score(sheet, snapshot.key)
+        metrics.SCORING_LATENCY.observe(time.perf_counter() - started)
+        
+        metrics.ANSWERS_SCORED.inc(total)
+        attempt = grading.record_attempt(quiz.pk, snapshot.version, sheet, score, total)
+        live.publish(quiz.pk, attempt.id, score, total)
+        
+        return Response({
+            'message': 'Quiz submitted successfully',
+            'attempt_id': attempt.id,
+            'version': snapshot.version,
+            'score': score,
+            'total': total,
+            'percentage': round((score / total) * 100, 2)
+        })
+    
+    @action(detail=True, methods=['get'], url_path='item-analysis')
+    def item_analysis(self, request, pk=None):
+        """Item difficulty, discrimination and distractor statistics - Admin"""
+        try:
+            quiz = self.get_object()
+        except Quiz.DoesNotExist:
+            return Response(
+                {
+                    'error': 'Quiz not found'
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        version = request.query_params.get('version')
+        if version is not None:
+            try:
+                version = int(version)
+            except ValueError:
+                return Response(
+                    {
+                        'error': 'version must be an integer'
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        report = analytics.analyze(quiz, version)
+        if report is None:
+            return Response(
+                {
+                    'error': f'Quiz version {version} is not available'
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response(
+            {
+                'message': 'Item analysis computed successfully',
+                'data': report
+            },
+            status=status.HTTP_200_OK
+        )
+    
+    @action(detail=True, methods=['post'])
+    def clone(self, request, pk=None):
+        """Copy a quiz with its questions and options - Admin"""
+        try:
+            quiz = self.get_object()
+        except Quiz.DoesNotExist:
+            return Response(
+                {
+                    'error': 'Quiz not found'
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        title = request.data.get('title') or f'{quiz.title} (copy)'[:200]
+        serializer = QuizSerializer(data={'title': title})
+        
+        if serializer.is_valid():
+            clone = bulk.clone_quiz(quiz, serializer.validated_data['title'])
+            return Response(
+                {
+                    'message': 'Quiz cloned successfully',
+                    'data': QuizSerializer(clone).data
+                },
+                status=status.HTTP_201_CREATED
+            )
+        
+        return Response(
+            {
+                'error': 'Validation failed',
+                'details': serializer.errors
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    @action(detail=True, methods=['post'])
+    def regrade(self, request, pk=None):
+        """Re-score stored attempts against the current answer key - Admin"""
+        try:
+            quiz = self.get_object()
+            regraded = grading.regrade_quiz(quiz)
+            
+            return Response(
+                {
+                    'message': 'Quiz attempts regraded successfully',
+                    'version': quiz.version,
+                    'regraded': regraded
+                },
+                status=status.HTTP_200_OK
+            )
+        except Quiz.DoesNotExist:
+            return Response(
+                {
+                    'error': 'Quiz not found'
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
 
 
 class QuestionViewSet(viewsets.ModelViewSet):
@@ -332,6 +700,7 @@ class QuestionViewSet(viewsets.ModelViewSet):
             return QuestionDetailSerializer
         return QuestionCreateSerializer
     
+    @metrics.instrument('question_create')
     def create(self, request, *args, **kwargs):
         """Create a new question with options"""
         serializer = self.get_serializer(data=request.data)
@@ -355,6 +724,50 @@ class QuestionViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    def update(self, request, *args, **kwargs):
+        """Update a question and diff its options by id"""
+        partial = kwargs.pop('partial', False)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        
+        if serializer.is_valid():
+            self.perform_update(serializer)
+            response_serializer = QuestionDetailSerializer(serializer.instance)
+            return Response(
+                {
+                    'message': 'Question updated successfully',
+                    'data': response_serializer.data
+                }
+            )
+        
+        return Response(
+            {
+                'error': 'Validation failed',
+                'details': serializer.errors
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    @transaction.atomic
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        snapshots.bump_version(serializer.instance.quiz_id)
+        coherence.bump(serializer.instance.quiz_id)
+    
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old_quiz_id = serializer.instance.quiz_id
+        super().perform_update(serializer)
+        snapshots.bump_version(old_quiz_id, serializer.instance.quiz_id)
+        coherence.bump(old_quiz_id, serializer.instance.quiz_id)
+    
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        quiz_id = instance.quiz_id
+        super().perform_destroy(instance)
+        snapshots.bump_version(quiz_id)
+        coherence.bump(quiz_id)
+    
     def list(self, request, *args, **kwargs):
         """List all questions"""
         queryset = self.filter_queryset(self.get_queryset())
@@ -0,0 +1,99 @@
+"""
+Cache warm-up for freshly started workers.
+
+Preloads what the first requests of a worker process would otherwise pay
+for, keeping only work whose result outlives the warm-up itself: the
+URLconf (which imports every view and serializer module), and the most
+recent quizzes in this process's quiz cache and snapshot LRU, with their
+rendered `take` payloads in Django's cache. Used by `QuizConfig.ready()`
+when QUIZ_WARM_ON_STARTUP is set, and by `manage.py warm_caches`, which
+runs in a process of its own and so only keeps what is shared: snapshots
+stored in the database and payloads in a shared cache backend.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+WARM_QUIZ_COUNT = getattr(settings, 'QUIZ_WARM_QUIZ_COUNT', 20)
+
+
+def load_urls():
+    """Import the URLconf and its views and build the resolver's lookup tables"""
+    from django.urls import get_resolver
+
+    resolver = get_resolver()
+    # Both are cached on the (process-wide) resolver once built
+    resolver.reverse_dict
+    resolver.resolve('/api/quizzes/1/take/')
+    return len(resolver.url_patterns)
+
+
+def preload_quizzes(count):
+    """Cache the newest quizzes with their snapshots and rendered take payloads"""
+    from . import cache as payload_cache
+    from . import coherence
+    from . import snapshots
+    from .models import Quiz, QuizGeneration
+
+    quiz_ids = list(Quiz.objects.order_by('-created_at').values_list('id', flat=True)[:count])
+    # Generations are read before the quizzes, as in the views, so a write
+    # landing in between leaves an entry looking stale rather than current
+    generations = dict(
+        QuizGeneration.objects.filter(quiz_id__in=quiz_ids).values_list('quiz_id', 'generation')
+    )
+    quizzes = list(Quiz.objects.filter(pk__in=quiz_ids))
+
+    for quiz in quizzes:
+        if quiz.pk in generations:
+            coherence.quizzes.set(quiz.pk, generations[quiz.pk], quiz)
+
+        snapshot = snapshots.get_snapshot(quiz)
+        if snapshot.take is not None:
+            payload_cache.get_variants(
+                payload_cache.TAKE, quiz.pk, quiz.version, lambda: snapshot.take
+            )
+    return len(quizzes)
+
+
+def warm(quiz_count=WARM_QUIZ_COUNT, urls=True):
+    """Run the warm-up steps, returning (step, seconds, items) timings"""
+    steps = [('quizzes', lambda: preload_quizzes(quiz_count))]
+    if urls:
+        steps.insert(0, ('urls', load_urls))
+
+    timings = []
+    for name, step in steps:
+        started = time.perf_counter()
+        items = step()
+        timings.append((name, time.perf_counter() - started, items))
+
+    return timings
+
+
+def warm_on_startup(quiz_count=WARM_QUIZ_COUNT):
+    """Warm-up run from QuizConfig.ready(), logging the cold-start cost"""
+    from django.apps import apps
+    from django.db import DatabaseError
+
+    # Queries are discouraged until every app is ready
+    apps.ready_event.wait()
+
+    try:
+        timings = warm(quiz_count)
+    except DatabaseError:
+        logger.exception('Quiz cache warm-up failed')
+        return
+    finally:
+        # This thread's connections are not the ones requests will use
+        connections.close_all()
+
+    logger.info(
+        'Quiz cache warm-up took %.1fms (%s)',
+        sum(seconds for _, seconds, _ in timings) * 1000,
+        ', '.join(f'{name}: {seconds * 1000:.1f}ms' for name, seconds, _ in timings)
+    )